@@ -0,0 +1,234 @@
+"""Speed and accuracy benchmark over a PDF corpus.
+
+    python -m benchmarks.corpus                      # compare against benchmarks/baseline.json
+    python -m benchmarks.corpus --save-baseline      # record a new baseline
+
+Every PDF in --input is run through DocumentProcessor with metrics on. Wall time
+per stage, pages/sec, peak RSS and bytes per text block are reported, plus
+heading precision/recall/F1 for the PDFs that have an expected outline in
+--labels. With --memory the peak Python heap of each document is traced as well
+(slower, timings are inflated). The run fails when throughput or F1 drop below
+the stored baseline by more than the tolerances, or when import time or cold
+start exceed their budgets (see benchmarks.startup).
+"""
+import argparse
+import json
+import resource
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from process_pdfs import DocumentProcessor
+from train_model import normalize, EXPECTED_PAGE_OFFSET
+from utils.classifier import DEFAULT_MODEL_PATH
+from utils.extractor import STRATEGIES
+from .startup import add_budget_args, check_startup, measure_startup, print_startup, probe_pdf
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+STAGES = ('title', 'fitz', 'plumber', 'merge', 'train', 'predict', 'format')
+
+
+def run_document(processor, pdf_path):
+    result, report = processor.run_file(pdf_path)
+    record = report["metrics"]
+    timings = {stage: record["stages"].get(stage, 0.0) for stage in STAGES}
+    counts = record["counts"]
+    return result, timings, counts.get("pages", 0), counts.get("blocks", 0), counts.get("block_bytes", 0)
+
+
+def score(outline, expected, page_offset=EXPECTED_PAGE_OFFSET):
+    predicted = Counter((normalize(item['text']), item['page']) for item in outline)
+    wanted = Counter((normalize(item['text']), item['page'] + page_offset) for item in expected)
+    true_positives = sum((predicted & wanted).values())
+    return true_positives, sum(predicted.values()) - true_positives, sum(wanted.values()) - true_positives
+
+
+def f1_summary(true_positives, false_positives, false_negatives):
+    precision = true_positives / (true_positives + false_positives) if true_positives + false_positives else 0.0
+    recall = true_positives / (true_positives + false_negatives) if true_positives + false_negatives else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": round(precision, 4), "recall": round(recall, 4), "f1": round(f1, 4)}
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def traced_peak_mb(function, *args):
+    """Run function and return its result with the peak traced heap in MB"""
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak / (1024 * 1024)
+
+
+def run_corpus(processor, pdf_files, labels_dir, page_offset, memory=False):
+    documents = {}
+    totals = dict.fromkeys(STAGES, 0.0)
+    counts = [0, 0, 0]
+    total_pages, total_time, peak_heap = 0, 0.0, 0.0
+    total_blocks, total_block_bytes = 0, 0
+    
+    for pdf_file in pdf_files:
+        start = time.perf_counter()
+        if memory:
+            (result, timings, pages, blocks, block_bytes), heap = traced_peak_mb(
+                run_document, processor, str(pdf_file))
+        else:
+            result, timings, pages, blocks, block_bytes = run_document(processor, str(pdf_file))
+        elapsed = time.perf_counter() - start
+        
+        entry = {
+            "pages": pages, "blocks": blocks, "sections": len(result["outline"]),
+            "seconds": round(elapsed, 4),
+            "stages": {stage: round(seconds, 4) for stage, seconds in timings.items()},
+        }
+        if "outline_source" in result:
+            entry["outline_source"] = result["outline_source"]
+        if memory:
+            entry["peak_heap_mb"] = round(heap, 2)
+            peak_heap = max(peak_heap, heap)
+        
+        label_file = Path(labels_dir) / f"{pdf_file.stem}.json"
+        if label_file.exists():
+            with open(label_file, encoding='utf-8') as f:
+                expected = json.load(f).get('outline', [])
+            matched = score(result["outline"], expected, page_offset)
+            counts = [total + value for total, value in zip(counts, matched)]
+            entry["accuracy"] = f1_summary(*matched)
+        
+        documents[pdf_file.name] = entry
+        for stage, seconds in timings.items():
+            totals[stage] += seconds
+        total_pages += pages
+        total_blocks += blocks
+        total_block_bytes += block_bytes
+        total_time += elapsed
+        
+        accuracy = f"  F1 {entry['accuracy']['f1']:.3f}" if "accuracy" in entry else ""
+        heap_note = f"  heap {heap:.1f} MB" if memory else ""
+        print(f"{pdf_file.name:<28} {pages:>5} pages {elapsed:>8.2f}s{accuracy}{heap_note}")
+    
+    summary = {
+        "documents": documents,
+        "pages": total_pages,
+        "seconds": round(total_time, 4),
+        "pages_per_sec": round(total_pages / total_time, 3) if total_time else 0.0,
+        "stages": {stage: round(seconds, 4) for stage, seconds in totals.items()},
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "bytes_per_block": round(total_block_bytes / total_blocks, 1) if total_blocks else 0.0,
+        "accuracy": f1_summary(*counts),
+    }
+    if memory:
+        summary["peak_heap_mb"] = round(peak_heap, 2)
+    return summary
+
+
+def print_summary(summary):
+    print()
+    print(f"{summary['pages']} pages in {summary['seconds']:.2f}s = {summary['pages_per_sec']:.2f} pages/sec, "
+          f"peak RSS {summary['peak_rss_mb']:.0f} MB, {summary['bytes_per_block']:.0f} bytes per text block")
+    if "peak_heap_mb" in summary:
+        print(f"Peak traced heap of a single document: {summary['peak_heap_mb']:.1f} MB")
+    for stage, seconds in summary["stages"].items():
+        share = 100 * seconds / summary["seconds"] if summary["seconds"] else 0
+        print(f"  {stage:<8} {seconds:>9.3f}s {share:>5.1f}%")
+    accuracy = summary["accuracy"]
+    print(f"Headings: precision {accuracy['precision']:.3f}, recall {accuracy['recall']:.3f}, F1 {accuracy['f1']:.3f}")
+
+
+def check_regressions(summary, baseline, throughput_tolerance, f1_tolerance):
+    failures = []
+    min_throughput = baseline["pages_per_sec"] * (1 - throughput_tolerance)
+    if summary["pages_per_sec"] < min_throughput:
+        failures.append(f"throughput {summary['pages_per_sec']:.2f} pages/sec is below "
+                        f"{min_throughput:.2f} (baseline {baseline['pages_per_sec']:.2f})")
+    
+    min_f1 = baseline["accuracy"]["f1"] - f1_tolerance
+    if summary["accuracy"]["f1"] < min_f1:
+        failures.append(f"F1 {summary['accuracy']['f1']:.3f} is below {min_f1:.3f} "
+                        f"(baseline {baseline['accuracy']['f1']:.3f})")
+    return failures
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark speed and heading accuracy over a PDF corpus")
+    parser.add_argument("--input", default=str(BASE_DIR / "input"), help="directory with the PDF files")
+    parser.add_argument("--labels", default=str(BASE_DIR / "expected output"),
+                        help="directory with expected outline JSONs named like the PDFs")
+    parser.add_argument("--page-offset", type=int, default=EXPECTED_PAGE_OFFSET,
+                        help="added to label pages to match output pages (default: 1)")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="both")
+    parser.add_argument("--model", default=str(DEFAULT_MODEL_PATH))
+    parser.add_argument("--per-document", action="store_true")
+    parser.add_argument("--bookmarks", action="store_true", help="take outlines from good PDF bookmarks")
+    parser.add_argument("--memory", action="store_true",
+                        help="trace the peak Python heap of each document (slower)")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="baseline JSON to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--results", default=None, help="also write the full results JSON here")
+    parser.add_argument("--throughput-tolerance", type=float, default=0.2,
+                        help="allowed relative drop in pages/sec (default: 0.2)")
+    parser.add_argument("--f1-tolerance", type=float, default=0.01,
+                        help="allowed absolute drop in F1 (default: 0.01)")
+    parser.add_argument("--skip-startup", action="store_true", help="don't measure import time and cold start")
+    add_budget_args(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    pdf_files = sorted(Path(args.input).glob("*.pdf"))
+    if not pdf_files:
+        print("No PDF files found")
+        return 1
+    
+    model_path = None if args.per_document else args.model
+    processor = DocumentProcessor(strategy=args.strategy, model_path=model_path, metrics=True,
+                                  bookmarks=args.bookmarks)
+    summary = run_corpus(processor, pdf_files, args.labels, args.page_offset, args.memory)
+    summary["config"] = {"strategy": args.strategy, "pretrained": processor.detector.pretrained,
+                         "bookmarks": args.bookmarks}
+    print_summary(summary)
+    
+    failures = []
+    if not args.skip_startup:
+        summary["startup"] = measure_startup(probe_pdf(args.input, args.strategy), args.strategy, model_path,
+                                             args.startup_repeats)
+        print_startup(summary["startup"])
+        failures = check_startup(summary["startup"], args.import_budget, args.cold_start_budget)
+        for failure in failures:
+            print(f"OVER BUDGET: {failure}")
+    
+    if args.results:
+        Path(args.results).write_text(json.dumps(summary, indent=2), encoding='utf-8')
+    
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(summary, indent=2), encoding='utf-8')
+        print(f"Baseline saved to {baseline_path}")
+        return 1 if failures else 0
+    
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}, run with --save-baseline to create one")
+        return 1 if failures else 0
+    
+    baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+    regressions = check_regressions(summary, baseline, args.throughput_tolerance, args.f1_tolerance)
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    if not regressions:
+        print(f"No regression against {baseline_path}")
+    return 1 if failures or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Micro-benchmark of batched heading inference against the previous
+per-document predict + predict_proba calls.
+
+    python -m benchmarks.inference --model models/heading_model.joblib [pdf ...]
+
+Features of every PDF (default: input/*.pdf) are built once; the pretrained
+model then flags them per document as before and in batches of each
+--batch-size. Flags must match; the model time per document is printed.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+import numpy as np
+from utils import TextExtractor, HeadingDetector
+from utils.classifier import DEFAULT_MODEL_PATH
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def legacy_flags(detector, features):
+    features_scaled = detector.scaler.transform(features)
+    predictions = detector.model.predict(features_scaled)
+    probabilities = detector.model.predict_proba(features_scaled)[:, 1]
+    return np.array([(pred == 1 and prob > 0.8) for pred, prob in zip(predictions, probabilities)], dtype=bool)
+
+
+def batched_flags(detector, feature_matrices, batch_size):
+    flags = []
+    for start in range(0, len(feature_matrices), batch_size):
+        flags.extend(detector.predict_batch(feature_matrices[start:start + batch_size]))
+    return flags
+
+
+def timed(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        flags = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return flags, best
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare batched heading inference with per-document calls")
+    parser.add_argument("pdfs", nargs="*", help="PDF files (default: input/*.pdf)")
+    parser.add_argument("--model", default=str(DEFAULT_MODEL_PATH), help="pretrained heading model")
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[1, 4, 16, 64],
+                        help="documents per batch to time (default: 1 4 16 64)")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs, best is reported")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    detector = HeadingDetector(args.model)
+    if not detector.pretrained:
+        print(f"No pretrained model at {args.model}, train one with train_model.py")
+        return 1
+    
+    pdf_files = args.pdfs or sorted((BASE_DIR / "input").glob("*.pdf"))
+    extractor = TextExtractor(strategy='fitz')
+    feature_matrices = []
+    for pdf_file in pdf_files:
+        text_blocks = extractor.get_text_blocks(str(pdf_file))
+        if text_blocks:
+            feature_matrices.append(detector._build_features(text_blocks))
+    if not feature_matrices:
+        print("No text blocks found")
+        return 1
+    
+    documents = len(feature_matrices)
+    before, before_time = timed(lambda: [legacy_flags(detector, features) for features in feature_matrices],
+                                args.repeat)
+    print(f"{sum(len(features) for features in feature_matrices)} blocks in {documents} documents")
+    print(f"{'batch size':<12} {'ms/document':>12} {'speedup':>8}  flags")
+    print(f"{'before':<12} {1000 * before_time / documents:>12.2f} {'':>8}")
+    
+    mismatches = 0
+    for batch_size in args.batch_size:
+        after, after_time = timed(lambda: batched_flags(detector, feature_matrices, batch_size), args.repeat)
+        differing = sum(1 for old, new in zip(before, after) if not np.array_equal(old, new))
+        mismatches += differing
+        print(f"{batch_size:<12} {1000 * after_time / documents:>12.2f} {before_time / after_time:>7.1f}x  "
+              f"{'identical' if not differing else f'{differing} documents differ'}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Micro-benchmark of the array-based pdfplumber line grouping against the
+previous per-char implementation.
+
+    python -m benchmarks.lines [pdf ...]
+
+The chars of every page of the given PDFs (default: input/*.pdf) are grouped
+by both versions; the lines must match and the per-char cost of each is printed.
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from utils import PDFDocument, TextExtractor
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def legacy_make_line(char_list):
+    if not char_list:
+        return None
+    
+    text = ''.join(c.get('text', '') for c in char_list)
+    sizes = [c.get('size', 12) for c in char_list if c.get('size')]
+    fonts = [c.get('fontname', '') for c in char_list if c.get('fontname')]
+    
+    return {
+        'text': text,
+        'avg_size': statistics.mean(sizes) if sizes else 12,
+        'font': fonts[0] if fonts else '',
+        'bold': any('bold' in f.lower() or 'black' in f.lower() for f in fonts if f),
+        'y_pos': min(c['top'] for c in char_list)
+    }
+
+
+def legacy_group_chars(chars):
+    sorted_chars = sorted(chars, key=lambda c: (round(c['top'], 1), c['x0']))
+    lines, current_line, current_y = [], [], None
+    
+    for char in sorted_chars:
+        char_y = round(char['top'], 1)
+        if current_y is None or abs(char_y - current_y) > 3:
+            if current_line:
+                lines.append(legacy_make_line(current_line))
+            current_line = [char]
+            current_y = char_y
+        else:
+            current_line.append(char)
+    
+    if current_line:
+        lines.append(legacy_make_line(current_line))
+    return [line for line in lines if line]
+
+
+def timed(function, pages, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        lines = [function(chars) for chars in pages]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return lines, best
+
+
+def load_pages(pdf_files):
+    pages = []
+    for pdf_file in pdf_files:
+        with PDFDocument(str(pdf_file)) as document:
+            for page in document.plumber_pages():
+                chars = page.chars
+                if chars:
+                    pages.append(chars)
+                page.flush_cache()
+    return pages
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare array-based line grouping with the previous implementation")
+    parser.add_argument("pdfs", nargs="*", help="PDF files (default: input/*.pdf)")
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs, best is reported")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    pdf_files = args.pdfs or sorted((BASE_DIR / "input").glob("*.pdf"))
+    pages = load_pages(pdf_files)
+    if not pages:
+        print("No chars found")
+        return 1
+    
+    chars = sum(len(page) for page in pages)
+    before, before_time = timed(legacy_group_chars, pages, args.repeat)
+    after, after_time = timed(TextExtractor()._group_chars, pages, args.repeat)
+    differing = sum(1 for old, new in zip(before, after) if old != new)
+    
+    print(f"{chars} chars on {len(pages)} pages from {len(pdf_files)} files")
+    print(f"before {1e6 * before_time / chars:.2f} us/char, after {1e6 * after_time / chars:.2f} us/char, "
+          f"{before_time / after_time:.1f}x")
+    print(f"lines: {'identical' if not differing else f'{differing} pages differ'}")
+    return 1 if differing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Checks and cost of the page digests behind --page-cache-dir.
+
+    python -m benchmarks.page_cache [pdf ...]
+
+Small PDFs are built that draw the same content stream but differ only in an
+object the font references indirectly (an /Encoding with /Differences, the
+/W widths of a descendant font, an embedded font file); their page digests
+must differ. The same page written with other object numbers must keep its
+digest. The digest time per page of the given PDFs (default: input/*.pdf) is
+then printed.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from utils import PDFDocument
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+CONTENT = b"BT /F1 24 Tf 72 720 Td (AAA) Tj ET"
+
+SIMPLE_FONT = b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding %(next)d 0 R >>"
+ENCODING = b"<< /Type /Encoding /BaseEncoding /WinAnsiEncoding /Differences [65 /%(glyph)s] >>"
+
+COMPOSITE_FONT = b"<< /Type /Font /Subtype /Type0 /BaseFont /Test /Encoding /Identity-H /DescendantFonts [%(next)d 0 R] >>"
+DESCENDANT_FONT = (b"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /Test /CIDSystemInfo << /Registry (Adobe) "
+                   b"/Ordering (Identity) /Supplement 0 >> /W [65 [%(width)d]] /CIDToGIDMap /Identity >>")
+
+EMBEDDED_FONT = b"<< /Type /Font /Subtype /TrueType /BaseFont /Test /FontDescriptor %(next)d 0 R >>"
+FONT_DESCRIPTOR = b"<< /Type /FontDescriptor /FontName /Test /Flags 32 /FontFile2 %(next)d 0 R >>"
+FONT_FILE = b"<< /Length %(length)d >>\nstream\n%(data)s\nendstream"
+
+
+def build_pdf(font_objects, first_font=5):
+    """A one-page PDF whose font F1 is the first of `font_objects` (byte
+    templates filled with their successor's number as %(next)d), numbered
+    from `first_font` right after the content stream"""
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        3: b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+           b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (first_font - 1, first_font),
+        first_font - 1: b"<< /Length %d >>\nstream\n%s\nendstream" % (len(CONTENT), CONTENT),
+    }
+    for index, template in enumerate(font_objects):
+        objects[first_font + index] = template % {b"next": first_font + index + 1}
+    
+    pdf = bytearray(b"%PDF-1.7\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(pdf)
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, objects[number])
+    xref = len(pdf)
+    size = max(objects) + 1
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % size
+    for number in range(1, size):
+        pdf += b"%010d 00000 n \n" % offsets[number] if number in offsets else b"0000000000 65535 f \n"
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref)
+    return bytes(pdf)
+
+
+def font_file(data):
+    return FONT_FILE.replace(b"%(length)d", b"%d" % len(data)).replace(b"%(data)s", data)
+
+
+# Pairs of font object chains that must hash differently
+DIFFERING = {
+    "encoding differences": ([SIMPLE_FONT, ENCODING % {b"glyph": b"B"}],
+                             [SIMPLE_FONT, ENCODING % {b"glyph": b"C"}]),
+    "descendant font widths": ([COMPOSITE_FONT, DESCENDANT_FONT % {b"width": 500}],
+                               [COMPOSITE_FONT, DESCENDANT_FONT % {b"width": 600}]),
+    "embedded font file": ([EMBEDDED_FONT, FONT_DESCRIPTOR, font_file(b"glyf table one")],
+                           [EMBEDDED_FONT, FONT_DESCRIPTOR, font_file(b"glyf table two")]),
+}
+
+
+def page_digest(pdf):
+    with PDFDocument(pdf) as document:
+        return document.page_digest(0)
+
+
+def check_digests():
+    failures = 0
+    for name, (first, second) in DIFFERING.items():
+        differ = page_digest(build_pdf(first)) != page_digest(build_pdf(second))
+        moved = page_digest(build_pdf(first)) == page_digest(build_pdf(first, first_font=10))
+        failures += (not differ) + (not moved)
+        print(f"{name:<24} {'differ' if differ else 'SAME DIGEST':<12} "
+              f"{'stable when renumbered' if moved else 'CHANGES WHEN RENUMBERED'}")
+    return failures
+
+
+def time_digests(pdf_files):
+    pages, elapsed = 0, 0.0
+    for pdf_file in pdf_files:
+        with PDFDocument(str(pdf_file)) as document:
+            start = time.perf_counter()
+            for page_num in range(document.page_count):
+                document.page_digest(page_num)
+            elapsed += time.perf_counter() - start
+            pages += document.page_count
+    if pages:
+        print(f"{pages} pages from {len(pdf_files)} files: {1000 * elapsed / pages:.2f} ms/page")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check page digests and time them")
+    parser.add_argument("pdfs", nargs="*", help="PDF files to time (default: input/*.pdf)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    failures = check_digests()
+    time_digests(args.pdfs or sorted((BASE_DIR / "input").glob("*.pdf")))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""Micro-benchmark of the compiled heading rules against the previous
+per-call regex implementation.
+
+    python -m benchmarks.rules [pdf ...]
+
+Every block of the given PDFs (default: input/*.pdf) goes through both
+versions; decisions must match and the per-block cost of each is printed.
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from utils import TextExtractor, HeadingDetector, OutlineFormatter
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def legacy_basic_check(block):
+    text = block.text.strip()
+    
+    if not (5 <= len(text) <= 120):
+        return False
+    
+    skip_patterns = [
+        r'copyright', r'version \d+', r'page \d+', r'^\d+$',
+        r'may \d+, \d+', r'^\d+ [A-Z]{3,4} \d+$',
+        r'www\.', r'@', r'\.com', r'^\w+$'
+    ]
+    
+    if any(re.search(pattern, text.lower()) for pattern in skip_patterns):
+        return False
+    
+    if re.match(r'^\d+\.\s+[A-Z]', text) or re.match(r'^\d+\.\d+\s+[A-Z]', text):
+        return True
+    
+    section_names = [
+        'table of contents', 'revision history', 'acknowledgements',
+        'introduction to the foundation level extensions',
+        'business outcomes', 'content', 'references', 'trademarks',
+        'learning objectives', 'entry requirements'
+    ]
+    
+    text_lower = text.lower().strip()
+    if any(section in text_lower and len(text) <= 100 for section in section_names):
+        return True
+    
+    if block.bold and 10 <= len(text) <= 80:
+        return True
+    
+    if block.size > 13 and 10 <= len(text) <= 70:
+        return True
+    
+    return False
+
+
+def legacy_should_skip(text):
+    text_lower = text.lower().strip()
+    
+    bullet_patterns = [
+        r'^\s*[•·▪▫▬→‣⁃]\s+', r'^\s*[-*+]\s+', r'^\s*[a-z]\)\s+',
+        r'^\s*[a-z]\.\s+[a-z]', r'^\s*[ivxlc]+\)\s+', r'^\s*[ivxlc]+\.\s+[a-z]',
+        r'^\s*\([a-z]\)\s+', r'^\s*\d+\)\s+', r'^\s*\(\d+\)\s+',
+    ]
+    if any(re.search(pattern, text, re.IGNORECASE) for pattern in bullet_patterns):
+        return True
+    
+    skip_patterns = [
+        r'^\d+\s+[A-Z]{3,4}\s+\d+$', r'^may \d+, \d+$',
+        r'^version \d+', r'^copyright', r'^\d+$',
+        r'^[\d\s\-/.,;:()\[\]]+$'
+    ]
+    if any(re.match(pattern, text) or re.match(pattern, text_lower) for pattern in skip_patterns):
+        return True
+    
+    bullet_content_words = [
+        'overview', 'international', 'software', 'testing', 'qualifications',
+        'board', 'foundation', 'level', 'extension', 'agile', 'tester', 'syllabus',
+        'example', 'note', 'important', 'warning', 'tip', 'remember'
+    ]
+    if text_lower in bullet_content_words:
+        return True
+    
+    if not (5 <= len(text) <= 120):
+        return True
+    
+    bullet_content_patterns = [
+        r'the following', r'as follows', r'for example', r'such as', r'including',
+        r'please note', r'^note:', r'^tip:', r'^warning:', r'^important:'
+    ]
+    if any(re.search(pattern, text_lower) for pattern in bullet_content_patterns):
+        return True
+    
+    return False
+
+
+def legacy_assign_level(heading):
+    text = heading.text
+    
+    bullet_patterns = [
+        r'^\s*[•·▪▫▬→‣⁃]\s+', r'^\s*[-*+]\s+', r'^\s*[a-z]\)\s+',
+        r'^\s*[ivxlc]+\)\s+', r'^\s*\d+\)\s+'
+    ]
+    if any(re.search(pattern, text, re.IGNORECASE) for pattern in bullet_patterns):
+        return {"level": "H3", "text": text, "page": heading.page}
+    
+    if re.match(r'^\d+\.\s+[A-Z]', text):
+        level = "H1"
+    elif re.match(r'^\d+\.\d+\s+[A-Z]', text):
+        level = "H2"
+    elif re.match(r'^\d+\.\d+\.\d+\s+', text):
+        level = "H3"
+    elif any(section in text.lower() for section in ['table of contents', 'revision history', 'references']):
+        level = "H1"
+    elif any(section in text.lower() for section in ['business outcomes', 'content', 'learning objectives']):
+        level = "H2"
+    else:
+        if (text[0].islower() or
+            any(word in text.lower() for word in ['the following', 'as follows', 'including', 'such as'])):
+            level = "H3"
+        else:
+            level = "H1"
+    
+    return {"level": level, "text": text, "page": heading.page}
+
+
+def timed(function, items, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decisions = [function(item) for item in items]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return decisions, best
+
+
+def load_blocks(pdf_files):
+    extractor = TextExtractor(strategy='fitz')
+    blocks = []
+    for pdf_file in pdf_files:
+        blocks.extend(extractor.get_text_blocks(str(pdf_file)))
+    return blocks
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare compiled heading rules with the previous implementation")
+    parser.add_argument("pdfs", nargs="*", help="PDF files (default: input/*.pdf)")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs, best is reported")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    pdf_files = args.pdfs or sorted((BASE_DIR / "input").glob("*.pdf"))
+    blocks = load_blocks(pdf_files)
+    if not blocks:
+        print("No text blocks found")
+        return 1
+    
+    detector = HeadingDetector(model_path=None)
+    formatter = OutlineFormatter()
+    texts = [block.text for block in blocks]
+    headings = [block for block in blocks if not formatter._should_skip(block.text)]
+    
+    cases = [
+        ("_basic_check", legacy_basic_check, detector._basic_check, blocks),
+        ("_should_skip", legacy_should_skip, formatter._should_skip, texts),
+        ("_assign_level", legacy_assign_level, formatter._assign_level, headings),
+    ]
+    
+    print(f"{len(blocks)} blocks from {len(pdf_files)} files")
+    print(f"{'rule':<15} {'before us/block':>16} {'after us/block':>15} {'speedup':>8}  decisions")
+    mismatches = 0
+    for name, legacy, compiled, items in cases:
+        if not items:
+            continue
+        before, before_time = timed(legacy, items, args.repeat)
+        after, after_time = timed(compiled, items, args.repeat)
+        differing = sum(1 for old, new in zip(before, after) if old != new)
+        mismatches += differing
+        print(f"{name:<15} {1e6 * before_time / len(items):>16.2f} {1e6 * after_time / len(items):>15.2f} "
+              f"{before_time / after_time:>7.1f}x  {'identical' if not differing else f'{differing} differ'}")
+    
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""Import time and cold start of the pipeline, measured in fresh interpreters.
+
+    python -m benchmarks.startup                     # check against the default budgets
+    python -m benchmarks.startup --import-budget 0.3
+
+Each run starts a new Python process that imports process_pdfs, builds a
+DocumentProcessor and processes the shortest PDF that a heading model can be
+trained on, timing each step. The median over --repeats runs
+is compared with the budgets; the run fails when a budget is exceeded, when an
+unused heavy package (torch, transformers...) is loaded, or when scikit-learn
+was never loaded, which means the probe skipped classification.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from utils import PDFDocument, TextExtractor, HeadingDetector
+from utils.classifier import DEFAULT_MODEL_PATH
+from utils.extractor import STRATEGIES
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_IMPORT_BUDGET = 0.5
+DEFAULT_COLD_START_BUDGET = 3.0
+
+# Never needed at runtime; their presence means an import crept back in
+UNUSED_MODULES = ('torch', 'torchvision', 'transformers', 'pdf2image')
+TRACKED_MODULES = ('numpy', 'fitz', 'pdfplumber', 'sklearn', 'scipy') + UNUSED_MODULES
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import process_pdfs
+imported = time.perf_counter()
+processor = process_pdfs.DocumentProcessor(strategy=sys.argv[2], model_path=sys.argv[3] or None)
+ready = time.perf_counter()
+processor.process_file(sys.argv[1])
+done = time.perf_counter()
+print(json.dumps({
+    "import_seconds": imported - start,
+    "ready_seconds": ready - start,
+    "cold_start_seconds": done - start,
+    "modules": [name for name in json.loads(sys.argv[4]) if name in sys.modules],
+}))
+"""
+
+
+def probe_pdf(input_dir, strategy='both'):
+    """The PDF with the fewest pages (then bytes) that a heading model can be
+    trained on, so cold start isn't dominated by parsing but does include
+    loading scikit-learn, as every real document does"""
+    def length(pdf_file):
+        try:
+            with PDFDocument(str(pdf_file)) as document:
+                return document.page_count, pdf_file.stat().st_size
+        except Exception:
+            return float('inf'), pdf_file.stat().st_size
+    
+    pdf_files = sorted(Path(input_dir).glob("*.pdf"), key=length)
+    extractor = TextExtractor(strategy=strategy)
+    for pdf_file in pdf_files:
+        # Too few blocks, or blocks the rules all label alike, skip training
+        if HeadingDetector(None).train_on_document(extractor.get_text_blocks(str(pdf_file))):
+            return pdf_file
+    return pdf_files[0] if pdf_files else None
+
+
+def run_probe(pdf_path, strategy='both', model_path=DEFAULT_MODEL_PATH):
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, str(pdf_path), strategy, str(model_path or ""),
+         json.dumps(TRACKED_MODULES)],
+        cwd=BASE_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_startup(pdf_path, strategy='both', model_path=DEFAULT_MODEL_PATH, repeats=3):
+    runs = [run_probe(pdf_path, strategy, model_path) for _ in range(repeats)]
+    startup = {
+        key: round(statistics.median(run[key] for run in runs), 4)
+        for key in ("import_seconds", "ready_seconds", "cold_start_seconds")
+    }
+    startup["document"] = Path(pdf_path).name
+    startup["modules"] = runs[-1]["modules"]
+    return startup
+
+
+def print_startup(startup):
+    print(f"Startup: import {startup['import_seconds']:.3f}s, ready {startup['ready_seconds']:.3f}s, "
+          f"first document ({startup['document']}) {startup['cold_start_seconds']:.3f}s")
+    print(f"  loaded: {', '.join(startup['modules']) or 'none'}")
+
+
+def check_startup(startup, import_budget=DEFAULT_IMPORT_BUDGET, cold_start_budget=DEFAULT_COLD_START_BUDGET):
+    failures = []
+    if startup["import_seconds"] > import_budget:
+        failures.append(f"import takes {startup['import_seconds']:.3f}s, budget {import_budget:.3f}s")
+    if startup["cold_start_seconds"] > cold_start_budget:
+        failures.append(f"cold start takes {startup['cold_start_seconds']:.3f}s, budget {cold_start_budget:.3f}s")
+    unused = [name for name in startup["modules"] if name in UNUSED_MODULES]
+    if unused:
+        failures.append(f"unused packages imported: {', '.join(unused)}")
+    if "sklearn" not in startup["modules"]:
+        # Every real document pays for loading or training the heading model
+        failures.append(f"{startup['document']} never reached heading classification, "
+                        "scikit-learn load time is missing")
+    return failures
+
+
+def add_budget_args(parser):
+    parser.add_argument("--import-budget", type=float, default=DEFAULT_IMPORT_BUDGET,
+                        help=f"max seconds to import process_pdfs (default: {DEFAULT_IMPORT_BUDGET})")
+    parser.add_argument("--cold-start-budget", type=float, default=DEFAULT_COLD_START_BUDGET,
+                        help="max seconds from interpreter start to the first small document done "
+                             f"(default: {DEFAULT_COLD_START_BUDGET})")
+    parser.add_argument("--startup-repeats", type=int, default=3,
+                        help="fresh interpreters to take the median over (default: 3)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check import time and cold start against a budget")
+    parser.add_argument("--input", default=str(BASE_DIR / "input"),
+                        help="directory whose shortest classifiable PDF is used for the cold start")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="both")
+    parser.add_argument("--model", default=str(DEFAULT_MODEL_PATH))
+    parser.add_argument("--per-document", action="store_true")
+    add_budget_args(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    pdf_path = probe_pdf(args.input, args.strategy)
+    if pdf_path is None:
+        print("No PDF files found")
+        return 1
+    
+    model_path = None if args.per_document else args.model
+    startup = measure_startup(pdf_path, args.strategy, model_path, args.startup_repeats)
+    print_startup(startup)
+    failures = check_startup(startup, args.import_budget, args.cold_start_budget)
+    for failure in failures:
+        print(f"OVER BUDGET: {failure}")
+    if not failures:
+        print("Startup within budget")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
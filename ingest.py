@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""Asyncio ingestion pipeline: read, process and write PDFs as overlapping stages.
+
+    python ingest.py                      # one pass over the input directory
+    python ingest.py --watch              # keep processing PDFs as they arrive
+
+Readers load each PDF from the (possibly network-mounted) input directory into
+memory and check the result cache, a pool of warm processors parses the bytes
+as they are, and a writer stores the JSON results. The stages run concurrently
+and are joined by bounded queues, so a slow volume only stalls the stage that
+touches it and memory stays bounded however many files are waiting.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from process_pdfs import DocumentProcessor, _init_worker, _process_in_worker
+from utils.cache import ResultCache, DEFAULT_MAX_BYTES
+from utils.classifier import DEFAULT_MODEL_PATH
+from utils.extractor import STRATEGIES
+from utils.metrics import MetricsWriter
+
+
+class IngestPipeline:
+
+    def __init__(self, processor, workers=1, readers=2, queue_size=4, cache=None, metrics_writer=None):
+        self.processor = processor
+        self.workers = workers
+        self.readers = readers
+        self.queue_size = queue_size
+        self.cache = cache
+        self.metrics_writer = metrics_writer
+        self.processed = 0
+        self.failed = 0
+        self.cached = 0
+        self.degraded = 0
+    
+    def run(self, input_dir, output_dir, watch=False, poll_interval=1.0):
+        return asyncio.run(self._run(Path(input_dir), Path(output_dir), watch, poll_interval))
+    
+    async def _run(self, input_dir, output_dir, watch, poll_interval):
+        output_dir.mkdir(parents=True, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        
+        read_queue = asyncio.Queue(self.queue_size)
+        process_queue = asyncio.Queue(self.queue_size)
+        write_queue = asyncio.Queue(self.queue_size)
+        
+        io_pool = ThreadPoolExecutor(max_workers=self.readers + 1)
+        if self.workers > 1:
+            process_pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                               initargs=(self.processor._worker_options(),))
+            process = _process_in_worker
+        else:
+            # One thread keeps the event loop free while the warm processor runs
+            process_pool = ThreadPoolExecutor(max_workers=1)
+            process = self.processor.run_file
+        
+        try:
+            await asyncio.gather(
+                self._discover(input_dir, read_queue, watch, poll_interval, stop),
+                self._stage(self.readers, read_queue, process_queue, self.workers,
+                            lambda item: self._read(item, write_queue, io_pool)),
+                self._stage(self.workers, process_queue, write_queue, 1,
+                            lambda item: self._process(item, process_pool, process)),
+                self._stage(1, write_queue, None, 0, lambda item: self._write(item, output_dir, io_pool)),
+            )
+        finally:
+            process_pool.shutdown()
+            io_pool.shutdown()
+        
+        print(f"Processed {self.processed} files ({self.failed} failed, {self.degraded} degraded, "
+              f"{self.cached} from cache)")
+    
+    async def _stage(self, count, in_queue, out_queue, next_count, handle):
+        """Run `count` consumers of in_queue, then tell the `next_count` consumers
+        of out_queue that the stream ended; None marks the end"""
+        async def consume():
+            while True:
+                item = await in_queue.get()
+                if item is None:
+                    return
+                result = await handle(item)
+                if result is not None and out_queue is not None:
+                    await out_queue.put(result)
+        
+        await asyncio.gather(*(consume() for _ in range(count)))
+        for _ in range(next_count):
+            await out_queue.put(None)
+    
+    async def _discover(self, input_dir, read_queue, watch, poll_interval, stop):
+        try:
+            if not watch:
+                # Largest files first so a single big document doesn't become the tail
+                pdf_files = sorted(input_dir.glob("*.pdf"), key=lambda f: f.stat().st_size, reverse=True)
+                if not pdf_files:
+                    print("No PDF files found")
+                for pdf_file in pdf_files:
+                    if stop.is_set():
+                        break
+                    await read_queue.put(pdf_file)
+                return
+            
+            print(f"Watching {input_dir} for PDF files...")
+            done, candidates = {}, {}
+            while not stop.is_set():
+                for pdf_file in sorted(input_dir.glob("*.pdf")):
+                    try:
+                        stat = pdf_file.stat()
+                    except OSError:
+                        continue
+                    signature = (stat.st_size, stat.st_mtime_ns)
+                    if done.get(pdf_file) == signature:
+                        continue
+                    # Only pick up files that did not change since the last poll,
+                    # so half-copied files are not read
+                    if candidates.get(pdf_file) == signature:
+                        del candidates[pdf_file]
+                        done[pdf_file] = signature
+                        await read_queue.put(pdf_file)
+                    else:
+                        candidates[pdf_file] = signature
+                
+                try:
+                    await asyncio.wait_for(stop.wait(), poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for _ in range(self.readers):
+                await read_queue.put(None)
+    
+    async def _read(self, pdf_file, write_queue, io_pool):
+        loop = asyncio.get_running_loop()
+        try:
+            data = await loop.run_in_executor(io_pool, pdf_file.read_bytes)
+        except OSError as e:
+            print(f"  Error reading {pdf_file.name}: {e}")
+            return None
+        
+        digest = None
+        if self.cache is not None:
+            # Hashing and cache lookups touch the whole file and the cache
+            # directory, keep them off the event loop
+            digest = await loop.run_in_executor(io_pool, _sha256, data)
+            structure = await loop.run_in_executor(io_pool, self.cache.get, digest)
+            if structure is not None:
+                print(f"Cached {pdf_file.name}")
+                self.cached += 1
+                await write_queue.put((pdf_file, structure, None, None))
+                return None
+        
+        return pdf_file, data, digest
+    
+    async def _process(self, item, process_pool, process):
+        pdf_file, data, digest = item
+        print(f"Processing {pdf_file.name}...")
+        try:
+            # The bytes are parsed in place, or pickled to a worker as they are
+            structure, report = await asyncio.get_running_loop().run_in_executor(
+                process_pool, process, data, pdf_file.name)
+        except Exception as e:
+            print(f"  Error processing {pdf_file.name}: {e}")
+            self.failed += 1
+            return None
+        return pdf_file, structure, report, digest
+    
+    async def _write(self, item, output_dir, io_pool):
+        pdf_file, structure, report, digest = item
+        output_file = output_dir / f"{pdf_file.stem}.json"
+        data = json.dumps(structure, indent=2, ensure_ascii=False)
+        try:
+            await asyncio.get_running_loop().run_in_executor(io_pool, _write_text, output_file, data)
+        except OSError as e:
+            print(f"  Error writing {output_file.name}: {e}")
+            self.failed += 1
+            return None
+        print(f"  -> {output_file.name} ({len(structure['outline'])} sections)")
+        
+        if report is None:
+            return None
+        self.processed += 1
+        self.failed += report["failed"]
+        self.degraded += bool(report.get("degraded"))
+        if self.metrics_writer is not None:
+            self.metrics_writer.write(report["metrics"])
+        if self.cache is not None and not report["failed"] and not report.get("degraded"):
+            try:
+                await asyncio.get_running_loop().run_in_executor(io_pool, self.cache.put, digest, structure)
+            except OSError as e:
+                print(f"  Error caching {pdf_file.name}: {e}")
+        return None
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _write_text(path, text):
+    # Write then rename, so readers of the output directory never see partial files
+    temp = path.with_suffix(f".{os.getpid()}.tmp")
+    temp.write_text(text, encoding='utf-8')
+    os.replace(temp, path)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract titles and outlines with an asyncio I/O pipeline")
+    parser.add_argument("--input", default=None, help="input directory (default: as process_pdfs.py)")
+    parser.add_argument("--output", default=None, help="output directory (default: as process_pdfs.py)")
+    parser.add_argument("--watch", action="store_true", help="keep running and process new PDFs as they arrive")
+    parser.add_argument("--poll-interval", type=float, default=1.0,
+                        help="seconds between input directory scans in --watch mode (default: 1)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes (default: 1 = process in a thread of this process)")
+    parser.add_argument("--readers", type=int, default=2, help="concurrent file reads (default: 2)")
+    parser.add_argument("--queue-size", type=int, default=4,
+                        help="files buffered between two stages (default: 4)")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="both")
+    parser.add_argument("--model", default=str(DEFAULT_MODEL_PATH),
+                        help="pretrained heading model, used when the file exists")
+    parser.add_argument("--per-document", action="store_true",
+                        help="ignore the pretrained model and train on each document")
+    parser.add_argument("--bookmarks", action="store_true",
+                        help="use the PDF's bookmarks as the outline when they pass a quality check")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="seconds per document before stages fall back to cheaper paths (default: none)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="reuse results of unchanged PDFs from this directory")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="cache size limit in MB (default: 512)")
+    parser.add_argument("--metrics", default=None,
+                        help="append per-document stage timings and counts to this JSON-lines file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    processor = DocumentProcessor(strategy=args.strategy, model_path=None if args.per_document else args.model,
+                                  metrics=args.metrics is not None, bookmarks=args.bookmarks, budget=args.budget)
+    input_dir, output_dir = processor._resolve_dirs()
+    
+    cache = None
+    if args.cache_dir:
+        cache = ResultCache(args.cache_dir, processor.cache_fingerprint(), args.cache_size * 1024 * 1024)
+    
+    metrics_writer = MetricsWriter(args.metrics) if args.metrics else None
+    start = time.perf_counter()
+    try:
+        IngestPipeline(processor, args.workers, args.readers, args.queue_size, cache, metrics_writer).run(
+            args.input or input_dir, args.output or output_dir, args.watch, args.poll_interval)
+    finally:
+        if metrics_writer is not None:
+            metrics_writer.close()
+    print(f"Processing complete in {time.perf_counter() - start:.2f}s!")
@@ -1,49 +1,258 @@
 #!/usr/bin/env python3
+import argparse
+import cProfile
 import json
 import os
+import pstats
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
 from pathlib import Path
 from utils import TextExtractor, HeadingDetector, OutlineFormatter
+from utils.bookmarks import BookmarkReader
+from utils.budget import DocumentBudget, NO_BUDGET
+from utils.cache import ResultCache, PageCache, file_digest, pipeline_fingerprint, DEFAULT_MAX_BYTES
+from utils.classifier import DEFAULT_MODEL_PATH
+from utils.document import is_buffer
+from utils.extractor import STRATEGIES
+from utils.metrics import DocumentMetrics, MetricsWriter, NULL_METRICS
+from utils.output import JsonLinesSink, DEFAULT_FLUSH_EVERY
 
 
-class DocumentProcessor:
+# Stands in for the file name of PDFs passed as bytes, in messages and metrics
+MEMORY_SOURCE_NAME = "in-memory.pdf"
+
+
+class PendingDocument:
+    """A document between extraction and heading detection; picklable, so
+    pool workers can hand it back for batched inference"""
     
-    def __init__(self):
-        self.extractor = TextExtractor()
-        self.detector = HeadingDetector()
+    def __init__(self, name, metrics):
+        self.name = name
+        self.metrics = metrics
+        self.result = {"title": "", "outline": []}
+        self.report = {"failed": False, "inference_time": 0.0}
+        self.budget = NO_BUDGET
+        self.text_blocks = None
+        self.features = None
+        self.profiler = None
+        # Stats a pool worker recorded for the extraction, added to the dump
+        self.profile_stats = None
+        self.profile_seconds = 0.0
+
+
+class DocumentProcessor:
+
+    def __init__(self, page_workers=1, page_parallel_threshold=200, strategy='both',
+                 model_path=DEFAULT_MODEL_PATH, metrics=False, profile_threshold=None,
+                 profile_dir="profiles", page_cache=None, bookmarks=False, budget=None):
+        self.strategy = strategy
+        self.model_path = model_path
+        # Per-stage metrics, and cProfile dumps of documents slower than the threshold
+        self.metrics = metrics
+        self.profile_threshold = profile_threshold
+        self.profile_dir = profile_dir
+        self.extractor = TextExtractor(page_workers, page_parallel_threshold, strategy, page_cache)
+        self.detector = HeadingDetector(model_path)
         self.formatter = OutlineFormatter()
+        # Take the outline from good embedded bookmarks instead of extracting text
+        self.bookmarks = BookmarkReader() if bookmarks else None
+        # Seconds per document before stages fall back to cheaper paths
+        self.budget = budget
+    
+    def process_file(self, source, name=None):
+        """Title and outline of a PDF given as a path or as bytes, bytearray,
+        memoryview or mmap; buffers are read in place, without a temp file"""
+        return self.run_file(source, name)[0]
+    
+    def run_file(self, source, name=None):
+        """Process one PDF, returning the result and a report of how it went.
+        `name` labels in-memory sources in messages, metrics and profiles."""
+        return self.finish_file(self.start_file(source, name=name))
+    
+    def start_file(self, source, batched=False, name=None):
+        """Extract a PDF up to heading detection. With `batched` (and a
+        pretrained model) its features are built so the caller can predict
+        them together with other documents' through an InferenceBatcher."""
+        name = name or (MEMORY_SOURCE_NAME if is_buffer(source) else str(source))
+        pending = PendingDocument(name, DocumentMetrics(name) if self.metrics else NULL_METRICS)
+        if self.budget:
+            pending.budget = DocumentBudget(self.budget)
+        with self._profiled(pending):
+            try:
+                document, pending.text_blocks = self._extract_blocks(source, pending.result, pending.metrics,
+                                                                     pending.budget)
+                if self.extractor.page_cache is not None:
+                    reused = len(document.reused_pages)
+                    pending.report["pages"] = {"reused": reused, "extracted": len(document.page_strategies) - reused}
+                if batched and self.detector.pretrained and pending.text_blocks:
+                    with pending.metrics.stage('predict'):
+                        pending.features = self.detector._build_features(pending.text_blocks)
+                    # The pending document holds them now, not the detector
+                    self.detector._clear_features()
+            except Exception as e:
+                print(f"Error processing {name}: {e}")
+                pending.report["failed"] = True
+        return pending
     
-    def process_file(self, pdf_path):
-        result = {"title": "", "outline": []}
+    def finish_file(self, pending, prediction=None):
+        """Detect headings and format the outline of a started document.
+        
+        `prediction` is the InferenceBatcher future for its features; without
+        one the document is trained on (if needed) and predicted on its own.
+        """
+        result, report, metrics, text_blocks = pending.result, pending.report, pending.metrics, pending.text_blocks
+        budget = pending.budget
+        with self._profiled(pending):
+            try:
+                if not report["failed"] and text_blocks:
+                    if (prediction is None and not self.detector.pretrained
+                            and not budget.allows('train', self.detector.train_estimate(len(text_blocks)))):
+                        # No time to train a model for this document, the rules alone decide
+                        budget.degrade('train', "rule-based headings instead of training")
+                        with metrics.stage('predict'):
+                            heading_flags = [self.detector._basic_check(block) for block in text_blocks]
+                    elif prediction is None:
+                        self.detector.last_inference_time = 0.0
+                        with metrics.stage('train'):
+                            self.detector.train_on_document(text_blocks)
+                        with metrics.stage('predict'):
+                            heading_flags = self.detector.find_headings(text_blocks)
+                        report["inference_time"] = self.detector.last_inference_time
+                    else:
+                        with metrics.stage('predict'):
+                            heading_flags = self._batched_flags(pending, prediction)
+                    self._format_outline(text_blocks, heading_flags, result, metrics, budget)
+            except Exception as e:
+                print(f"Error processing {pending.name}: {e}")
+                report["failed"] = True
         
+        if budget.degraded:
+            # Best effort within the budget, not the full pipeline's answer
+            result["degraded"] = dict(budget.degraded)
+            report["degraded"] = sorted(budget.degraded)
+            metrics.count(degraded=1, **{f"degraded_{stage}": 1 for stage in budget.degraded})
+        self._save_profile(pending)
+        pending.text_blocks = pending.features = None
+        report["metrics"] = metrics.to_dict()
+        if report["metrics"] is not None:
+            report["metrics"]["failed"] = report["failed"]
+            if "profile" in report:
+                report["metrics"]["profile"] = report["profile"]
+        return result, report
+    
+    def submit_file(self, pending, batcher):
+        """Queue a started document's features, returning the future to finish it with"""
+        if pending.features is None:
+            return None
+        return batcher.submit(pending.features)
+    
+    def new_batcher(self, max_batch_size, max_wait):
+        """An InferenceBatcher over the pretrained model, or None when batching
+        is off (batch size 1) or documents get their own trained model"""
+        if max_batch_size <= 1 or not self.detector.pretrained:
+            return None
+        from utils.batching import InferenceBatcher
+        return InferenceBatcher(self.detector, max_batch_size, max_wait)
+    
+    def _batched_flags(self, pending, prediction):
         try:
-            result["title"] = self.extractor.get_title(pdf_path)
-            text_blocks = self.extractor.get_text_blocks(pdf_path)
-            
-            if not text_blocks:
-                return result
-            
-            self.detector.train_on_document(text_blocks)
-            heading_flags = self.detector.find_headings(text_blocks)
-            
-            headings = [block for block, is_heading 
-                       in zip(text_blocks, heading_flags) if is_heading]
+            heading_flags, seconds, batch_size = prediction.result()
+        except Exception:
+            # Same fallback as HeadingDetector.find_headings
+            return [self.detector._basic_check(block) for block in pending.text_blocks]
+        
+        # Each document is charged an equal share of its batch
+        pending.report["inference_time"] = seconds / batch_size
+        pending.report["inference_batch"] = batch_size
+        return heading_flags
+    
+    @contextmanager
+    def _profiled(self, pending):
+        if self.profile_threshold is None:
+            yield
+            return
+        if pending.profiler is None:
+            pending.profiler = cProfile.Profile()
+        start = time.perf_counter()
+        pending.profiler.enable()
+        try:
+            yield
+        finally:
+            pending.profiler.disable()
+            pending.profile_seconds += time.perf_counter() - start
+    
+    def _save_profile(self, pending):
+        """Dump the document's profile if it ran for at least the threshold"""
+        if pending.profiler is None:
+            return
+        if pending.profile_seconds >= self.profile_threshold:
+            pending.report["profile"] = self._dump_profile(pending)
+        pending.profiler = pending.profile_stats = None
+    
+    def _detach_profile(self, pending):
+        """Swap the profiler, which doesn't pickle, for the stats it recorded"""
+        if pending.profiler is None:
+            return
+        pending.profiler.create_stats()
+        pending.profile_stats = pending.profiler.stats
+        pending.profiler = None
+    
+    def _dump_profile(self, pending):
+        stats = pstats.Stats(pending.profiler)
+        for function, function_stats in (pending.profile_stats or {}).items():
+            if function in stats.stats:
+                function_stats = pstats.add_func_stats(stats.stats[function], function_stats)
+            stats.stats[function] = function_stats
+        
+        profile_dir = Path(self.profile_dir)
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        profile_file = profile_dir / f"{Path(pending.name).stem}.prof"
+        stats.dump_stats(profile_file)
+        return str(profile_file)
+    
+    def _extract_blocks(self, source, result, metrics=NULL_METRICS, budget=NO_BUDGET):
+        """Title and text blocks of a PDF; no blocks when the bookmarks gave the outline"""
+        with self.extractor.open(source) as document:
+            document.metrics = metrics
+            document.budget = budget
+            self.extractor.check_readable(document)
+            with metrics.stage('title'):
+                result["title"] = self.extractor.get_title(document)
             
-            result["outline"] = self.formatter.format(headings)
-            return result
+            if self.bookmarks is not None:
+                with metrics.stage('bookmarks'):
+                    outline, rejected = self.bookmarks.read(document)
+                if outline is not None:
+                    result["outline"] = outline
+                    result["outline_source"] = "bookmarks"
+                    metrics.count(sections=len(outline))
+                    return document, None
+                result["outline_source"] = "text"
+                result["bookmarks_rejected"] = rejected
             
-        except Exception as e:
-            print(f"Error processing {pdf_path}: {e}")
-            return result
+            text_blocks = self.extractor.get_text_blocks(document)
+        
+        if self.strategy != 'both':
+            result["extraction"] = {
+                "strategy": self.strategy,
+                "pages": document.page_strategies
+            }
+        return document, text_blocks
     
-    def process_directory(self):
-        if os.path.exists("/app/input"):
-            input_dir = Path("/app/input")
-            output_dir = Path("/app/output")
-        else:
-            base_dir = Path(__file__).parent
-            input_dir = base_dir / "input"
-            output_dir = base_dir / "output"
+    def _format_outline(self, text_blocks, heading_flags, result, metrics=NULL_METRICS, budget=NO_BUDGET):
+        headings = text_blocks.take(heading_flags)
         
+        with metrics.stage('format'):
+            result["outline"] = self.formatter.format(headings, metrics, budget)
+        metrics.count(headings=len(headings), sections=len(result["outline"]))
+    
+    def process_directory(self, workers=None, max_in_flight=None, cache=None, metrics_writer=None,
+                          inference_batch_size=1, inference_max_wait=1.0, sink=None):
+        """Process every PDF of the input directory into one JSON file each, or
+        into `sink` (a JsonLinesSink) when given"""
+        input_dir, output_dir = self._resolve_dirs()
         output_dir.mkdir(parents=True, exist_ok=True)
         
         pdf_files = list(input_dir.glob("*.pdf"))
@@ -52,24 +261,268 @@ class DocumentProcessor:
             return
         
         print(f"Processing {len(pdf_files)} PDF files...")
+        if self.detector.pretrained:
+            print(f"Heading model loaded in {self.detector.load_time * 1000:.1f} ms")
+        
+        digests = {}
+        if cache is not None:
+            pdf_files = self._write_cached(pdf_files, output_dir, cache, digests, sink)
+        
+        workers = workers or os.cpu_count() or 1
+        batcher = self.new_batcher(inference_batch_size, inference_max_wait)
+        if batcher is not None:
+            outcomes = self._process_batched(pdf_files, batcher, workers, max_in_flight)
+        elif workers > 1 and len(pdf_files) > 1:
+            outcomes = self._process_parallel(pdf_files, workers, max_in_flight)
+        else:
+            outcomes = self._process_serial(pdf_files)
+        
+        inference_times = []
+        page_counts = {"reused": 0, "extracted": 0}
+        degraded_counts, degraded_documents, processed = {}, 0, 0
+        for pdf_file, outcome, error in outcomes:
+            if error is not None:
+                print(f"  Error processing {pdf_file.name}: {error}")
+                continue
+            
+            structure, report = outcome
+            processed += 1
+            inference_times.append(report["inference_time"])
+            if report.get("degraded"):
+                degraded_documents += 1
+                for stage in report["degraded"]:
+                    degraded_counts[stage] = degraded_counts.get(stage, 0) + 1
+            for key, count in report.get("pages", {}).items():
+                page_counts[key] += count
+            if metrics_writer is not None:
+                metrics_writer.write(report["metrics"])
+            if "profile" in report:
+                print(f"  Profile saved to {report['profile']}")
+            try:
+                self._write_result(structure, pdf_file, output_dir, sink)
+                # Degraded results may come out better next time, don't pin them
+                if cache is not None and not report["failed"] and not report.get("degraded"):
+                    cache.put(digests[pdf_file], structure)
+            except Exception as e:
+                print(f"  Error processing {pdf_file.name}: {e}")
         
+        if inference_times:
+            print(f"Heading inference: {1000 * sum(inference_times) / len(inference_times):.1f} ms/document avg, "
+                  f"{1000 * max(inference_times):.1f} ms max")
+        if batcher is not None:
+            batcher.close()
+            print(f"Inference batches: {batcher.batches} for {batcher.documents} documents")
+        if self.budget:
+            stages = ", ".join(f"{stage} {count}" for stage, count in sorted(degraded_counts.items()))
+            print(f"Degraded: {degraded_documents} of {processed} documents within the {self.budget:g}s budget"
+                  + (f" ({stages})" if stages else ""))
+        if cache is not None:
+            print(f"Cache: {cache.hits} hits, {cache.misses} misses")
+        if self.extractor.page_cache is not None:
+            print(f"Page cache: {page_counts['reused']} pages reused, {page_counts['extracted']} re-extracted")
+        print("Processing complete!")
+    
+    def _resolve_dirs(self):
+        if os.path.exists("/app/input"):
+            return Path("/app/input"), Path("/app/output")
+        base_dir = Path(__file__).parent
+        return base_dir / "input", base_dir / "output"
+    
+    def _write_cached(self, pdf_files, output_dir, cache, digests, sink=None):
+        """Write results of unchanged files from the cache, return the files left to process"""
+        remaining = []
         for pdf_file in pdf_files:
             try:
-                print(f"Processing {pdf_file.name}...")
-                structure = self.process_file(str(pdf_file))
-                
-                output_file = output_dir / f"{pdf_file.stem}.json"
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(structure, f, indent=2, ensure_ascii=False)
-                
-                print(f"  -> {output_file.name} ({len(structure['outline'])} sections)")
+                digests[pdf_file] = file_digest(pdf_file)
+                structure = cache.get(digests[pdf_file])
+                if structure is None:
+                    remaining.append(pdf_file)
+                    continue
                 
+                print(f"Cached {pdf_file.name}")
+                self._write_result(structure, pdf_file, output_dir, sink)
             except Exception as e:
                 print(f"  Error processing {pdf_file.name}: {e}")
+        return remaining
+    
+    def _process_serial(self, pdf_files, run=None):
+        run = run or self.run_file
+        for pdf_file in pdf_files:
+            print(f"Processing {pdf_file.name}...")
+            try:
+                yield pdf_file, run(str(pdf_file)), None
+            except Exception as e:
+                yield pdf_file, None, e
+    
+    def _process_batched(self, pdf_files, batcher, workers, max_in_flight=None):
+        """Extract documents (in this process or the pool), predict their
+        headings in batches here and finish them in submission order"""
+        if workers > 1 and len(pdf_files) > 1:
+            started = self._process_parallel(pdf_files, workers, max_in_flight, _start_in_worker)
+        else:
+            started = self._process_serial(pdf_files, lambda pdf_path: self.start_file(pdf_path, batched=True))
         
-        print("Processing complete!")
+        waiting = deque()
+        for pdf_file, pending, error in started:
+            if error is not None:
+                yield pdf_file, None, error
+                continue
+            waiting.append((pdf_file, pending, self.submit_file(pending, batcher)))
+            while waiting and (waiting[0][2] is None or waiting[0][2].done()):
+                pdf_file, pending, prediction = waiting.popleft()
+                yield pdf_file, self.finish_file(pending, prediction), None
+        
+        # Nothing else is coming, don't wait for the batch to fill
+        batcher.flush()
+        while waiting:
+            pdf_file, pending, prediction = waiting.popleft()
+            yield pdf_file, self.finish_file(pending, prediction), None
+    
+    def _process_parallel(self, pdf_files, workers, max_in_flight=None, task=None):
+        # Largest files first so a single big document doesn't become the tail
+        pending = sorted(pdf_files, key=lambda f: f.stat().st_size, reverse=True)
+        max_in_flight = max_in_flight or workers * 2
+        in_flight = {}
+        
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self._worker_options(),)) as pool:
+            while pending or in_flight:
+                while pending and len(in_flight) < max_in_flight:
+                    pdf_file = pending.pop(0)
+                    print(f"Processing {pdf_file.name}...")
+                    in_flight[pool.submit(task or _process_in_worker, str(pdf_file))] = pdf_file
+                
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pdf_file = in_flight.pop(future)
+                    try:
+                        yield pdf_file, future.result(), None
+                    except Exception as e:
+                        yield pdf_file, None, e
+    
+    def _result_options(self):
+        # Everything besides the code and the PDF that changes the output
+        return {"strategy": self.strategy, "model_path": self.model_path, "bookmarks": self.bookmarks is not None}
+    
+    def _worker_options(self):
+        # Batch workers already run one document each, so no page-level pool
+        return dict(self._result_options(), metrics=self.metrics, profile_threshold=self.profile_threshold,
+                    profile_dir=self.profile_dir, page_cache=self.extractor.page_cache, budget=self.budget)
+    
+    def cache_fingerprint(self):
+        return pipeline_fingerprint(self._result_options())
+    
+    def _write_result(self, structure, pdf_file, output_dir, sink=None):
+        if sink is not None:
+            sink.write(pdf_file.name, structure)
+            print(f"  -> {sink.path.name} ({len(structure['outline'])} sections)")
+            return
+        
+        output_file = output_dir / f"{pdf_file.stem}.json"
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(structure, f, indent=2, ensure_ascii=False)
+        
+        print(f"  -> {output_file.name} ({len(structure['outline'])} sections)")
+
+
+# Each pool worker keeps one warm processor for all documents it handles
+_worker_processor = None
+
+
+def _init_worker(options):
+    global _worker_processor
+    _worker_processor = DocumentProcessor(**options)
+
+
+def _process_in_worker(source, name=None):
+    return _worker_processor.run_file(source, name)
+
+
+def _start_in_worker(source, name=None):
+    pending = _worker_processor.start_file(source, batched=True, name=name)
+    # finish_file in the parent dumps the whole document's profile, if slow enough
+    _worker_processor._detach_profile(pending)
+    return pending
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract titles and outlines from PDF files")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: CPU count, 1 = serial)")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="documents queued or running at once (default: 2 x workers)")
+    parser.add_argument("--page-workers", type=int, default=1,
+                        help="processes per large document in serial mode (default: 1)")
+    parser.add_argument("--page-threshold", type=int, default=200,
+                        help="minimum page count before a document is split (default: 200)")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="both",
+                        help="fitz, both (fitz + pdfplumber on every page) or adaptive (default: both)")
+    parser.add_argument("--model", default=str(DEFAULT_MODEL_PATH),
+                        help="pretrained heading model, used when the file exists")
+    parser.add_argument("--per-document", action="store_true",
+                        help="ignore the pretrained model and train on each document")
+    parser.add_argument("--bookmarks", action="store_true",
+                        help="use the PDF's bookmarks as the outline when they pass a quality check")
+    parser.add_argument("--cache-dir", default=None,
+                        help="reuse results of unchanged PDFs from this directory")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="cache size limit in MB, least recently used entries go first (default: 512)")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="empty the cache before processing")
+    parser.add_argument("--page-cache-dir", default=None,
+                        help="reuse extracted blocks of unchanged pages from this directory")
+    parser.add_argument("--page-cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="page cache size limit in MB (default: 512)")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="seconds per document; past its share a stage falls back to a cheaper path and "
+                             "the result is marked degraded (default: no budget)")
+    parser.add_argument("--inference-batch-size", type=int, default=1,
+                        help="predict headings of up to this many documents in one pass of the pretrained "
+                             "model (default: 1 = per document)")
+    parser.add_argument("--inference-max-wait", type=float, default=1.0,
+                        help="seconds a document waits for its inference batch to fill (default: 1)")
+    parser.add_argument("--jsonl", default=None,
+                        help="append compact results to this JSON-lines file instead of one JSON file per PDF")
+    parser.add_argument("--jsonl-flush", type=int, default=DEFAULT_FLUSH_EVERY,
+                        help=f"results buffered between writes to --jsonl (default: {DEFAULT_FLUSH_EVERY})")
+    parser.add_argument("--metrics", default=None,
+                        help="append per-document stage timings and counts to this JSON-lines file")
+    parser.add_argument("--profile-threshold", type=float, default=None,
+                        help="save a cProfile dump of documents taking at least this many seconds")
+    parser.add_argument("--profile-dir", default="profiles",
+                        help="where profile dumps go (default: profiles)")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    processor = DocumentProcessor()
-    processor.process_directory()
+    args = parse_args()
+    model_path = None if args.per_document else args.model
+    page_cache = None
+    if args.page_cache_dir:
+        # Page blocks depend on the extraction code and strategy, not on the model
+        page_cache = PageCache(args.page_cache_dir, pipeline_fingerprint({"strategy": args.strategy}),
+                               args.page_cache_size * 1024 * 1024)
+        if args.clear_cache:
+            page_cache.clear()
+    processor = DocumentProcessor(args.page_workers, args.page_threshold, args.strategy, model_path,
+                                  args.metrics is not None, args.profile_threshold, args.profile_dir,
+                                  page_cache, args.bookmarks, args.budget)
+    
+    cache = None
+    if args.cache_dir:
+        cache = ResultCache(args.cache_dir, processor.cache_fingerprint(), args.cache_size * 1024 * 1024)
+        if args.clear_cache:
+            cache.clear()
+    
+    metrics_writer = MetricsWriter(args.metrics) if args.metrics else None
+    sink = JsonLinesSink(args.jsonl, args.jsonl_flush) if args.jsonl else None
+    try:
+        processor.process_directory(workers=args.workers, max_in_flight=args.max_in_flight,
+                                    cache=cache, metrics_writer=metrics_writer,
+                                    inference_batch_size=args.inference_batch_size,
+                                    inference_max_wait=args.inference_max_wait, sink=sink)
+    finally:
+        if metrics_writer is not None:
+            metrics_writer.close()
+        if sink is not None:
+            sink.close()
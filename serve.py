@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""Long-running PDF outline service.
+
+    python serve.py --port 8080                  # HTTP on 127.0.0.1:8080
+    python serve.py --socket /tmp/outline.sock   # HTTP over a Unix socket
+    curl --data-binary @doc.pdf localhost:8080/process
+
+Imports, the heading model and the worker processes are loaded once at
+startup and reused for every request. Only the standard library is used on
+top of the pipeline's own dependencies, so it runs offline in the Docker image.
+"""
+import argparse
+import json
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+from process_pdfs import DocumentProcessor, _init_worker, _process_in_worker, _start_in_worker
+from utils.classifier import DEFAULT_MODEL_PATH
+from utils.extractor import STRATEGIES
+from utils.metrics import LatencyStats
+
+
+DEFAULT_MAX_MB = 100
+DEFAULT_BATCH_WAIT_MS = 10
+
+
+class OutlineService:
+    """Warm processor (or pool of warm worker processes) shared by all requests.
+    
+    At most `max_pending` documents are accepted at once; further requests are
+    turned away instead of queueing without bound. With a pretrained model and
+    `batch_size` > 1, concurrent requests share heading inference batches.
+    """
+    
+    def __init__(self, workers=1, max_pending=None, strategy='both', model_path=DEFAULT_MODEL_PATH,
+                 max_bytes=DEFAULT_MAX_MB * 1024 * 1024, bookmarks=False, batch_size=1,
+                 batch_wait=DEFAULT_BATCH_WAIT_MS / 1000, budget=None):
+        self.workers = workers
+        self.max_pending = max_pending or workers * 2
+        self.max_bytes = max_bytes
+        self.latency = LatencyStats()
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.degraded = 0
+        self.degraded_stages = {}
+        self.started = time.time()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        
+        self.processor = DocumentProcessor(strategy=strategy, model_path=model_path, bookmarks=bookmarks,
+                                           budget=budget)
+        self.batcher = self.processor.new_batcher(batch_size, batch_wait)
+        self.pool = None
+        self._process_lock = threading.Lock()
+        if workers > 1:
+            self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                            initargs=(dict(self.processor._result_options(), budget=budget),))
+            # Start the workers now so the first requests don't pay for their imports
+            for future in [self.pool.submit(_worker_ready) for _ in range(workers)]:
+                future.result()
+    
+    def try_acquire(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self._pending += 1
+        return True
+    
+    def release(self):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+    
+    def process(self, data, name=None):
+        """Process PDF bytes, returning (result, report). The bytes are parsed
+        in place (or sent to a worker as they are), never spooled to disk."""
+        if self.batcher is not None:
+            outcome = self._process_batched(data, name)
+        elif self.pool is not None:
+            outcome = self.pool.submit(_process_in_worker, data, name).result()
+        else:
+            # The in-process detector and its caches are not thread-safe
+            with self._process_lock:
+                outcome = self.processor.run_file(data, name)
+        
+        with self._lock:
+            self.processed += 1
+            self.failed += outcome[1]["failed"]
+            if outcome[1].get("degraded"):
+                self.degraded += 1
+                for stage in outcome[1]["degraded"]:
+                    self.degraded_stages[stage] = self.degraded_stages.get(stage, 0) + 1
+        return outcome
+    
+    def _process_batched(self, data, name=None):
+        if self.pool is not None:
+            pending = self.pool.submit(_start_in_worker, data, name).result()
+        else:
+            with self._process_lock:
+                pending = self.processor.start_file(data, batched=True, name=name)
+        # Waiting for the batch and formatting don't touch the extractor or
+        # the detector's caches, so other requests can extract meanwhile
+        return self.processor.finish_file(pending, self.processor.submit_file(pending, self.batcher))
+    
+    def health(self):
+        with self._lock:
+            return {
+                "status": "ok",
+                "uptime": round(time.time() - self.started, 1),
+                "workers": self.workers,
+                "pretrained": self.processor.detector.pretrained,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "processed": self.processed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "degraded": self.degraded,
+            }
+    
+    def stats(self):
+        stats = dict(self.health(), requests=self.latency.count, latency_ms=self.latency.percentiles())
+        if self.processor.budget:
+            with self._lock:
+                stats["budget"] = {"seconds": self.processor.budget, "degraded_stages": dict(self.degraded_stages)}
+        if self.batcher is not None:
+            stats["inference_batching"] = self.batcher.stats()
+        return stats
+    
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+        if self.batcher is not None:
+            self.batcher.close()
+
+
+def _worker_ready():
+    return os.getpid()
+
+
+class OutlineHandler(BaseHTTPRequestHandler):
+
+    service = None
+    
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/health':
+            self._send_json(200, self.service.health())
+        elif path == '/stats':
+            self._send_json(200, self.service.stats())
+        else:
+            self._send_json(404, {"error": f"unknown path {path}"})
+    
+    def do_POST(self):
+        path = urlparse(self.path).path
+        if path != '/process':
+            self._send_json(404, {"error": f"unknown path {path}"})
+            return
+        
+        start = time.perf_counter()
+        # Take the slot before reading the body, so --max-pending bounds the
+        # request bodies held in memory as well as the documents in progress
+        if not self.service.try_acquire():
+            # The body is left unread, the connection can't be reused
+            self.close_connection = True
+            self._send_json(503, {"error": "too many documents in progress"},
+                            {"Retry-After": "1", "Connection": "close"})
+            return
+        try:
+            status, body, headers = self._process_body(start)
+        finally:
+            self.service.release()
+        self._send_json(status, body, headers)
+    
+    def _process_body(self, start):
+        """Read and process the request body, returning (status, body, headers)"""
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = 0
+        if length <= 0:
+            return 400, {"error": "send the PDF as the request body"}, None
+        if length > self.service.max_bytes:
+            self.close_connection = True
+            return 413, {"error": f"PDF larger than {self.service.max_bytes} bytes"}, {"Connection": "close"}
+        data = self.rfile.read(length)
+        
+        try:
+            result, report = self.service.process(data)
+        except Exception as e:
+            return 500, {"error": str(e)}, None
+        
+        elapsed = time.perf_counter() - start
+        self.service.latency.record(elapsed)
+        if report["failed"]:
+            return 422, {"error": "could not process PDF"}, None
+        return 200, result, {"X-Processing-Time": f"{elapsed:.4f}"}
+    
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if self.client_address else 'unix'
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+    
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name, self.server_port = 'localhost', 0
+
+
+def make_server(service, host='127.0.0.1', port=8080, socket_path=None):
+    handler = type('BoundOutlineHandler', (OutlineHandler,), {'service': service})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        return ThreadingUnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve PDF title/outline extraction over HTTP")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--socket", default=None, help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes (default: 1 = process in the server)")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="documents accepted at once, more get 503 (default: 2 x workers)")
+    parser.add_argument("--max-size", type=int, default=DEFAULT_MAX_MB,
+                        help=f"largest accepted PDF in MB (default: {DEFAULT_MAX_MB})")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="both")
+    parser.add_argument("--model", default=str(DEFAULT_MODEL_PATH),
+                        help="pretrained heading model, used when the file exists")
+    parser.add_argument("--per-document", action="store_true",
+                        help="ignore the pretrained model and train on each document")
+    parser.add_argument("--bookmarks", action="store_true",
+                        help="use the PDF's bookmarks as the outline when they pass a quality check")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="seconds per document; past its share a stage falls back to a cheaper path and "
+                             "the result is marked degraded (default: no budget)")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="predict headings of up to this many concurrent documents in one pass of the "
+                             "pretrained model (default: 1 = per document)")
+    parser.add_argument("--batch-wait", type=float, default=DEFAULT_BATCH_WAIT_MS,
+                        help=f"ms a document waits for its inference batch to fill (default: {DEFAULT_BATCH_WAIT_MS})")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    service = OutlineService(args.workers, args.max_pending, args.strategy,
+                             None if args.per_document else args.model, args.max_size * 1024 * 1024,
+                             args.bookmarks, args.batch_size, args.batch_wait / 1000, args.budget)
+    server = make_server(service, args.host, args.port, args.socket)
+    where = args.socket or f"http://{args.host}:{args.port}"
+    print(f"Serving on {where} with {args.workers} worker(s), up to {service.max_pending} documents at once")
+    # docker stop sends SIGTERM, shut down the same way as on Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+from utils import TextExtractor, HeadingDetector
+from utils.classifier import DEFAULT_MODEL_PATH
+from utils.extractor import STRATEGIES
+
+
+BASE_DIR = Path(__file__).parent
+
+# Pages in the expected outputs are 0-based, extracted blocks are 1-based
+EXPECTED_PAGE_OFFSET = 1
+
+
+def normalize(text):
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def label_blocks(text_blocks, outline, page_offset=EXPECTED_PAGE_OFFSET):
+    headings = {(normalize(item['text']), item['page'] + page_offset) for item in outline}
+    return [int((normalize(text), page) in headings)
+            for text, page in zip(text_blocks.text, text_blocks.page.tolist())]
+
+
+def load_corpus(input_dir, labels_dir, extractor, page_offset=EXPECTED_PAGE_OFFSET):
+    documents = []
+    for label_file in sorted(Path(labels_dir).glob("*.json")):
+        pdf_file = Path(input_dir) / f"{label_file.stem}.pdf"
+        if not pdf_file.exists():
+            print(f"  Skipping {label_file.name}: no matching PDF")
+            continue
+        
+        with open(label_file, encoding='utf-8') as f:
+            outline = json.load(f).get('outline', [])
+        
+        text_blocks = extractor.get_text_blocks(str(pdf_file))
+        labels = label_blocks(text_blocks, outline, page_offset)
+        print(f"  {pdf_file.name}: {len(text_blocks)} blocks, {sum(labels)} headings")
+        documents.append((text_blocks, labels))
+    return documents
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the heading model on a labeled corpus")
+    parser.add_argument("--input", default=str(BASE_DIR / "input"),
+                        help="directory with the PDF files")
+    parser.add_argument("--labels", default=str(BASE_DIR / "expected output"),
+                        help="directory with expected outline JSONs named like the PDFs")
+    parser.add_argument("--output", default=str(DEFAULT_MODEL_PATH),
+                        help="where to save the model")
+    parser.add_argument("--page-offset", type=int, default=EXPECTED_PAGE_OFFSET,
+                        help="added to label pages to match extracted pages (default: 1)")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="both",
+                        help="extraction strategy used to build training blocks")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    
+    print("Extracting training blocks...")
+    documents = load_corpus(args.input, args.labels, TextExtractor(strategy=args.strategy), args.page_offset)
+    if not any(sum(labels) for _, labels in documents):
+        raise SystemExit("No labeled headings found")
+    
+    start = time.perf_counter()
+    detector = HeadingDetector(model_path=None)
+    samples = detector.train_on_corpus(documents)
+    detector.save(args.output)
+    print(f"Trained on {samples} blocks from {len(documents)} documents "
+          f"in {time.perf_counter() - start:.2f}s -> {args.output}")
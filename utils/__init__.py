@@ -1,5 +1,21 @@
-from .extractor import TextExtractor
-from .classifier import HeadingDetector
-from .formatter import OutlineFormatter
+# Submodules are imported on first use, so e.g. a fitz-only run never loads
+# pdfplumber and tools that only need constants don't load scikit-learn
+_EXPORTS = {
+    'PDFDocument': 'document',
+    'TextBlock': 'blocks',
+    'TextBlocks': 'blocks',
+    'TextExtractor': 'extractor',
+    'HeadingDetector': 'classifier',
+    'OutlineFormatter': 'formatter',
+}
 
-__all__ = ['TextExtractor', 'HeadingDetector', 'OutlineFormatter']
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    value = getattr(import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,87 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+# Queue markers: predict what was collected now / then stop the thread
+_FLUSH = object()
+_CLOSE = object()
+
+
+class InferenceBatcher:
+    """Runs the heading model over the features of several documents at once.
+    
+    Documents are submitted from any thread; a background thread collects them
+    and predicts a batch once it holds `max_batch_size` documents or its first
+    document has waited `max_wait` seconds. Each submit returns a Future that
+    resolves to ``(flags, seconds, batch_size)``.
+    """
+    
+    def __init__(self, detector, max_batch_size=16, max_wait=0.01):
+        self.detector = detector
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.documents = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+        self._thread.start()
+    
+    def submit(self, features):
+        future = Future()
+        self._queue.put((features, future))
+        return future
+    
+    def flush(self):
+        """Predict the documents collected so far without waiting for more"""
+        self._queue.put(_FLUSH)
+    
+    def close(self):
+        self._queue.put(_CLOSE)
+        self._thread.join()
+    
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait": self.max_wait,
+            "batches": self.batches,
+            "documents": self.documents,
+        }
+    
+    def _run(self):
+        closing = False
+        while not closing:
+            item = self._queue.get()
+            if item is _CLOSE:
+                return
+            if item is _FLUSH:
+                continue
+            
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _FLUSH or item is _CLOSE:
+                    closing = item is _CLOSE
+                    break
+                batch.append(item)
+            self._predict(batch)
+    
+    def _predict(self, batch):
+        start = time.perf_counter()
+        try:
+            flags = self.detector.predict_batch([features for features, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        
+        seconds = time.perf_counter() - start
+        self.batches += 1
+        self.documents += len(batch)
+        for (_, future), document_flags in zip(batch, flags):
+            future.set_result((document_flags, seconds, len(batch)))
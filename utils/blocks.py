@@ -0,0 +1,123 @@
+import sys
+import numpy as np
+
+
+SOURCES = ('fitz', 'plumber')
+
+
+class TextBlock:
+    """One extracted line; used while a page is extracted and merged"""
+    
+    __slots__ = ('text', 'size', 'page', 'font', 'bold', 'y_pos', 'source')
+    
+    def __init__(self, text, size, page, font, bold, y_pos, source):
+        self.text = text
+        self.size = size
+        self.page = page
+        self.font = font
+        self.bold = bold
+        self.y_pos = y_pos
+        self.source = source
+    
+    def __eq__(self, other):
+        if not isinstance(other, TextBlock):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+    
+    def __repr__(self):
+        return f"TextBlock({self.text!r}, page={self.page}, size={self.size}, source={self.source!r})"
+    
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class TextBlocks:
+    """Column store for all lines of a document.
+    
+    Numbers live in NumPy arrays (size, page, y_pos, bold) and strings in
+    tables: ``text`` is a plain list, fonts and sources are stored once and
+    referenced by index. Iterating or indexing yields TextBlock records.
+    """
+    
+    def __init__(self, text=(), size=(), page=(), y_pos=(), bold=(), font_ids=(), fonts=(),
+                 source_ids=()):
+        self.text = list(text)
+        self.size = np.asarray(size, dtype=np.float64)
+        self.page = np.asarray(page, dtype=np.int32)
+        self.y_pos = np.asarray(y_pos, dtype=np.float64)
+        self.bold = np.asarray(bold, dtype=bool)
+        self.font_ids = np.asarray(font_ids, dtype=np.int32)
+        self.fonts = list(fonts)
+        self.source_ids = np.asarray(source_ids, dtype=np.uint8)
+    
+    @classmethod
+    def from_blocks(cls, blocks):
+        """Build the columns in one pass, without keeping the records"""
+        text, size, page, y_pos, bold, font_ids, source_ids = [], [], [], [], [], [], []
+        font_table = {}
+        for block in blocks:
+            text.append(block.text)
+            size.append(block.size)
+            page.append(block.page)
+            y_pos.append(block.y_pos)
+            bold.append(block.bold)
+            font_ids.append(font_table.setdefault(block.font, len(font_table)))
+            source_ids.append(SOURCES.index(block.source))
+        return cls(text, size, page, y_pos, bold, font_ids, font_table, source_ids)
+    
+    @classmethod
+    def concat(cls, parts):
+        parts = [part for part in parts if len(part)]
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return cls()
+        
+        # Re-key each part's font ids against one shared font table
+        font_table, font_ids = {}, []
+        for part in parts:
+            remap = np.array([font_table.setdefault(font, len(font_table)) for font in part.fonts],
+                             dtype=np.int32)
+            font_ids.append(remap[part.font_ids])
+        
+        return cls(
+            [text for part in parts for text in part.text],
+            np.concatenate([part.size for part in parts]),
+            np.concatenate([part.page for part in parts]),
+            np.concatenate([part.y_pos for part in parts]),
+            np.concatenate([part.bold for part in parts]),
+            np.concatenate(font_ids),
+            font_table,
+            np.concatenate([part.source_ids for part in parts]),
+        )
+    
+    def __len__(self):
+        return len(self.text)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.take(np.arange(len(self))[index])
+        return TextBlock(self.text[index], float(self.size[index]), int(self.page[index]),
+                         self.fonts[self.font_ids[index]], bool(self.bold[index]),
+                         float(self.y_pos[index]), SOURCES[self.source_ids[index]])
+    
+    def __iter__(self):
+        fonts = self.fonts
+        for text, size, page, y_pos, bold, font_id, source_id in zip(
+                self.text, self.size.tolist(), self.page.tolist(), self.y_pos.tolist(),
+                self.bold.tolist(), self.font_ids.tolist(), self.source_ids.tolist()):
+            yield TextBlock(text, size, page, fonts[font_id], bold, y_pos, SOURCES[source_id])
+    
+    def take(self, indices):
+        """Blocks at the given row indices (or boolean mask), in that order"""
+        indices = np.asarray(indices)
+        indices = np.flatnonzero(indices) if indices.dtype == bool else indices.astype(np.intp)
+        return TextBlocks([self.text[i] for i in indices.tolist()], self.size[indices],
+                          self.page[indices], self.y_pos[indices], self.bold[indices],
+                          self.font_ids[indices], self.fonts, self.source_ids[indices])
+    
+    def nbytes(self):
+        """Approximate memory held by the columns, strings included"""
+        arrays = (self.size, self.page, self.y_pos, self.bold, self.font_ids, self.source_ids)
+        strings = sys.getsizeof(self.text) + sum(sys.getsizeof(text) for text in self.text)
+        return sum(array.nbytes for array in arrays) + strings
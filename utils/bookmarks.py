@@ -0,0 +1,57 @@
+from . import rules
+
+
+MIN_ENTRIES = 2
+MAX_BAD_RATIO = 0.2
+LEVELS = {1: "H1", 2: "H2"}
+
+
+class BookmarkReader:
+    """Outline taken from the PDF's own bookmark tree, when it is good enough.
+    
+    Reading the bookmarks costs almost nothing compared to text extraction, so
+    documents whose bookmarks pass the quality check skip the rest of the
+    pipeline. Deeper levels than H2 all map to H3.
+    """
+    
+    def __init__(self, min_entries=MIN_ENTRIES, max_bad_ratio=MAX_BAD_RATIO):
+        self.min_entries = min_entries
+        self.max_bad_ratio = max_bad_ratio
+    
+    def read(self, document):
+        """Return (outline, None) or (None, reason the bookmarks were rejected)"""
+        try:
+            toc = document.fitz_doc.get_toc(simple=True)
+            page_count = document.page_count
+        except Exception as e:
+            return None, f"unreadable bookmarks: {e}"
+        
+        entries = [(level, rules.WHITESPACE.sub(' ', title).strip(), page) for level, title, page in toc]
+        reason = self._check(entries, page_count)
+        if reason:
+            return None, reason
+        
+        # A few entries without a usable destination (PyMuPDF gives page -1)
+        # pass the check, but have no place in the outline
+        return [{"level": LEVELS.get(level, "H3"), "text": text, "page": page}
+                for level, text, page in entries if 1 <= page <= page_count], None
+    
+    def _check(self, entries, page_count):
+        if not entries:
+            return "no bookmarks"
+        if len(entries) < self.min_entries:
+            return f"only {len(entries)} bookmark(s)"
+        
+        limit = self.max_bad_ratio * len(entries)
+        junk = sum(1 for _, text, _ in entries if rules.BOOKMARK_JUNK.search(text))
+        if junk > limit:
+            return f"{junk} of {len(entries)} bookmark titles are file names or empty"
+        
+        outside = sum(1 for _, _, page in entries if not 1 <= page <= page_count)
+        if outside > limit:
+            return f"{outside} of {len(entries)} bookmarks point outside the document"
+        
+        duplicates = len(entries) - len({(text.lower(), page) for _, text, page in entries})
+        if duplicates > limit:
+            return f"{duplicates} of {len(entries)} bookmarks are duplicates"
+        return None
@@ -0,0 +1,60 @@
+import time
+
+
+# Fraction of the budget that may be used up before each stage's full path is
+# given up: pdfplumber pages, extracting further pages at all, per-document
+# training, fuzzy deduplication
+DEFAULT_SHARES = {'plumber': 0.5, 'pages': 0.7, 'train': 0.75, 'dedup': 0.9}
+
+
+class DocumentBudget:
+    """Latency budget of one document.
+    
+    Stages ask `allows(stage, estimate)` before running their expensive path;
+    once the time used (plus the estimate) passes the stage's share of the
+    budget they take a cheaper one and record why with `degrade`. Checks are
+    cooperative, a stage that is already running is not interrupted.
+    """
+    
+    enabled = True
+    
+    def __init__(self, seconds, shares=None):
+        self.seconds = seconds
+        self.shares = dict(DEFAULT_SHARES, **(shares or {}))
+        # The monotonic clock is shared by the processes of one machine, so
+        # page range workers can carry the same deadline
+        self.start = time.monotonic()
+        self.degraded = {}
+    
+    def elapsed(self):
+        return time.monotonic() - self.start
+    
+    def allows(self, stage, estimate=0.0):
+        return self.elapsed() + estimate <= self.seconds * self.shares[stage]
+    
+    def degrade(self, stage, reason):
+        if stage not in self.degraded:
+            self.degraded[stage] = f"{reason} after {self.elapsed():.2f}s of {self.seconds:g}s"
+    
+    def merge(self, degraded):
+        for stage, reason in degraded.items():
+            self.degraded.setdefault(stage, reason)
+
+
+class NoBudget:
+    """Stand-in used without a budget: every stage runs its full path"""
+    
+    enabled = False
+    degraded = {}
+    
+    def allows(self, stage, estimate=0.0):
+        return True
+    
+    def degrade(self, stage, reason):
+        pass
+    
+    def merge(self, degraded):
+        pass
+
+
+NO_BUDGET = NoBudget()
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from .blocks import TextBlock
+
+
+# Bump when results change for a reason the fingerprint can't see
+# (e.g. a dependency upgrade or a change in process_pdfs.py)
+PIPELINE_VERSION = 1
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Eviction goes down to this share of max_bytes, so it runs once per many
+# puts rather than rescanning the directory on every put at the limit
+EVICT_TO = 0.8
+
+UTILS_DIR = Path(__file__).resolve().parent
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pipeline_fingerprint(config):
+    """Hash of everything that decides a result apart from the PDF itself:
+    the pipeline version, the utils/ sources, the config and the model file"""
+    digest = hashlib.sha256(f"v{PIPELINE_VERSION}".encode())
+    for source in sorted(UTILS_DIR.glob("*.py")):
+        digest.update(source.name.encode())
+        digest.update(source.read_bytes())
+    
+    digest.update(json.dumps(config, sort_keys=True, default=str).encode())
+    model_path = config.get('model_path')
+    if model_path and Path(model_path).exists():
+        digest.update(file_digest(model_path).encode())
+    return digest.hexdigest()[:16]
+
+
+def _file_size(path):
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return None
+
+
+class ResultCache:
+    """On-disk cache of result JSONs keyed by PDF content hash and pipeline fingerprint.
+    
+    Entries are evicted least recently used first once the cache grows past
+    `max_bytes`. Entries of older fingerprints are never read again and age out.
+    Several processes may share the directory and evict from it at once.
+    """
+    
+    def __init__(self, cache_dir, fingerprint, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.fingerprint = fingerprint
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+    
+    def _entry(self, content_hash):
+        return self.cache_dir / f"{content_hash}.{self.fingerprint}.json"
+    
+    def get(self, content_hash):
+        entry = self._entry(content_hash)
+        try:
+            with open(entry, encoding='utf-8') as f:
+                result = json.load(f)
+            os.utime(entry)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        return result
+    
+    def put(self, content_hash, result):
+        entry = self._entry(content_hash)
+        data = json.dumps(result, ensure_ascii=False).encode('utf-8')
+        
+        size = self.size()
+        previous = _file_size(entry) or 0
+        
+        # Write then rename, so concurrent readers never see partial entries
+        temp = entry.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            temp.write_bytes(data)
+            os.replace(temp, entry)
+        except OSError:
+            temp.unlink(missing_ok=True)
+            raise
+        
+        self._size = size - previous + len(data)
+        if self._size > self.max_bytes:
+            self._evict()
+    
+    def size(self):
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._scan())
+        return self._size
+    
+    def _scan(self):
+        """(mtime, size, path) of the entries, skipping ones another process
+        removed while the directory was listed"""
+        entries = []
+        for entry in self.cache_dir.glob("*.json"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        return entries
+    
+    def _evict(self):
+        entries = sorted(self._scan(), key=lambda item: item[0])
+        size = sum(entry_size for _, entry_size, _ in entries)
+        target = self.max_bytes * EVICT_TO
+        for _, entry_size, entry in entries:
+            if size <= target:
+                break
+            size -= entry_size
+            entry.unlink(missing_ok=True)
+        self._size = size
+    
+    def clear(self):
+        for entry in self.cache_dir.glob("*.json"):
+            entry.unlink(missing_ok=True)
+        self._size = 0
+
+
+class PageCache:
+    """Extracted blocks of single pages keyed by page content digest.
+    
+    Entries hold a page's merged blocks without the page number, so a page is
+    reused wherever it appears, in the same or another document.
+    """
+    
+    def __init__(self, cache_dir, fingerprint, max_bytes=DEFAULT_MAX_BYTES):
+        self.entries = ResultCache(cache_dir, fingerprint, max_bytes)
+        self._write_failed = False
+    
+    @property
+    def hits(self):
+        return self.entries.hits
+    
+    @property
+    def misses(self):
+        return self.entries.misses
+    
+    def get(self, digest, page_num):
+        """Return (blocks, strategy) for the page, or None"""
+        entry = self.entries.get(digest)
+        if entry is None:
+            return None
+        
+        blocks = [TextBlock(text, size, page_num + 1, font, bold, y_pos, source)
+                  for text, size, font, bold, y_pos, source in entry["blocks"]]
+        return blocks, entry["strategy"]
+    
+    def put(self, digest, blocks, strategy):
+        """Store a page's blocks. Best effort: a failed write (disk full,
+        permissions) leaves the page uncached instead of failing the document."""
+        try:
+            self.entries.put(digest, {
+                "strategy": strategy,
+                "blocks": [[b.text, b.size, b.font, b.bold, b.y_pos, b.source] for b in blocks],
+            })
+        except OSError as e:
+            if not self._write_failed:
+                print(f"Page cache write failed, pages are left uncached: {e}")
+            self._write_failed = True
+    
+    def clear(self):
+        self.entries.clear()
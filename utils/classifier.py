@@ -1,18 +1,98 @@
 import numpy as np
 import re
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
+import sys
+import time
+from pathlib import Path
+from . import rules
+
+
+DEFAULT_MODEL_PATH = Path(__file__).resolve().parent.parent / "models" / "heading_model.joblib"
+
+FEATURE_COUNT = 19
+# A block is a heading when the model gives it more than this probability
+HEADING_THRESHOLD = 0.8
+# float32 rounds sizes and positions differently and flips a few predictions
+FEATURE_DTYPE = np.float64
+
+# Smaller documents are not trained on, the rules alone decide
+MIN_TRAIN_BLOCKS = 10
+# Cost of per-document training, for latency budgets: fitting the forest takes
+# a roughly fixed time plus a little per block, and the first model of a
+# process also pays for importing scikit-learn
+TRAIN_SECONDS = 0.1
+TRAIN_SECONDS_PER_BLOCK = 3e-5
+SKLEARN_IMPORT_SECONDS = 1.3
+
+# Keyword flags, by feature column; the three list words share one column
+KEYWORD_COLUMNS = {
+    'introduction': 10, 'conclusion': 11, 'chapter': 12, 'section': 13,
+    'overview': 14, 'references': 15, 'table': 16, 'contents': 16, 'acknowledgement': 16,
+}
+# Lookahead so overlapping keywords (e.g. "contentsection") are all found
+KEYWORD_PATTERN = re.compile('(?=(' + '|'.join(KEYWORD_COLUMNS) + '))')
+NUMBERED_PATTERN = re.compile(r'\d+\.')
+SUBNUMBERED_PATTERN = re.compile(r'\d+\.\d+')
 
 
 class HeadingDetector:
-    
-    def __init__(self):
-        self.model = RandomForestClassifier(n_estimators=50, random_state=42, max_depth=10)
-        self.scaler = StandardScaler()
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH):
+        # scikit-learn is imported when a model is first loaded or trained
+        self.model = None
+        self.scaler = None
         self.is_ready = False
+        self.pretrained = False
+        self.load_time = 0.0
+        self.last_inference_time = 0.0
+        self._feature_blocks = None
+        self._features = None
+        
+        # Without a saved model, fall back to training on each document
+        if model_path and Path(model_path).exists():
+            self.load(model_path)
+    
+    def _new_model(self):
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(n_estimators=50, random_state=42, max_depth=10)
+    
+    def _new_scaler(self):
+        from sklearn.preprocessing import StandardScaler
+        return StandardScaler()
+    
+    def load(self, model_path):
+        start = time.perf_counter()
+        try:
+            import joblib
+            saved = joblib.load(model_path)
+            self.model, self.scaler = saved['model'], saved['scaler']
+            self.is_ready = self.pretrained = True
+        except Exception as e:
+            print(f"Could not load heading model {model_path}: {e}")
+        self.load_time = time.perf_counter() - start
+        return self.pretrained
+    
+    def save(self, model_path):
+        import joblib
+        Path(model_path).parent.mkdir(parents=True, exist_ok=True)
+        joblib.dump({'model': self.model, 'scaler': self.scaler}, model_path)
+    
+    def train_on_corpus(self, documents):
+        """Fit one model on (text_blocks, labels) pairs from many documents"""
+        documents = [(blocks, labels) for blocks, labels in documents if blocks]
+        features = np.vstack([self._build_features(blocks) for blocks, _ in documents])
+        labels = np.concatenate([np.asarray(labels) for _, labels in documents])
+        
+        self.model, self.scaler = self._new_model(), self._new_scaler()
+        self.model.fit(self.scaler.fit_transform(features), labels)
+        self.is_ready = self.pretrained = True
+        return features.shape[0]
     
     def train_on_document(self, text_blocks):
-        if len(text_blocks) < 10:
+        if self.pretrained:
+            return True
+        
+        self.is_ready = False
+        if len(text_blocks) < MIN_TRAIN_BLOCKS:
             return False
         
         try:
@@ -22,6 +102,8 @@ class HeadingDetector:
             if np.sum(labels) == 0 or np.sum(labels) == len(labels):
                 return False
             
+            if self.model is None:
+                self.model, self.scaler = self._new_model(), self._new_scaler()
             features_scaled = self.scaler.fit_transform(features)
             self.model.fit(features_scaled, labels)
             self.is_ready = True
@@ -29,74 +111,107 @@ class HeadingDetector:
         except:
             return False
     
+    def train_estimate(self, block_count):
+        """Seconds train_on_document is expected to take on this many blocks"""
+        if self.pretrained or block_count < MIN_TRAIN_BLOCKS:
+            return 0.0
+        estimate = TRAIN_SECONDS + TRAIN_SECONDS_PER_BLOCK * block_count
+        if 'sklearn.ensemble' not in sys.modules:
+            estimate += SKLEARN_IMPORT_SECONDS
+        return estimate
+    
     def find_headings(self, text_blocks):
-        if not self.is_ready or not text_blocks:
-            return [self._basic_check(block) for block in text_blocks]
-        
+        self.last_inference_time = 0.0
         try:
-            features = self._build_features(text_blocks)
-            features_scaled = self.scaler.transform(features)
-            predictions = self.model.predict(features_scaled)
-            probabilities = self.model.predict_proba(features_scaled)[:, 1]
+            if not self.is_ready or not text_blocks:
+                return [self._basic_check(block) for block in text_blocks]
             
-            return [(pred == 1 and prob > 0.8) for pred, prob in zip(predictions, probabilities)]
+            start = time.perf_counter()
+            features = self._build_features(text_blocks)
+            flags = self._predict_flags(features)
+            self.last_inference_time = time.perf_counter() - start
+            return flags.tolist()
         except:
             return [self._basic_check(block) for block in text_blocks]
+        finally:
+            # Also drops the features train_on_document built when it gave up
+            self._clear_features()
+    
+    def predict_batch(self, feature_matrices):
+        """Heading flags for the feature matrices of many documents, from one
+        scaler and forest pass over all their rows. Only valid for a pretrained
+        model, since per-document models differ between documents."""
+        row_counts = [len(features) for features in feature_matrices]
+        if not sum(row_counts):
+            return [np.zeros(0, dtype=bool) for _ in feature_matrices]
+        flags = self._predict_flags(np.vstack(feature_matrices))
+        return np.split(flags, np.cumsum(row_counts)[:-1])
+    
+    def _predict_flags(self, features):
+        # With classes 0 and 1, a probability above the threshold already
+        # means predict() would say 1, so one predict_proba pass is enough
+        probabilities = self.model.predict_proba(self.scaler.transform(features))[:, 1]
+        return probabilities > HEADING_THRESHOLD
     
     def _build_features(self, text_blocks):
-        features = []
-        for block in text_blocks:
-            text = block['text'].strip()
-            feature_row = [
-                len(text), block['size'], int(block.get('bold', False)),
-                len(text.split()), int(text.isupper()), int(text.istitle()),
-                int(bool(re.match(r'^\d+\.', text))), int(bool(re.match(r'^\d+\.\d+', text))),
-                text.count('.'), text.count(' '), int('introduction' in text.lower()),
-                int('conclusion' in text.lower()), int('chapter' in text.lower()),
-                int('section' in text.lower()), int('overview' in text.lower()),
-                int('references' in text.lower()), 
-                int(any(word in text.lower() for word in ['table', 'contents', 'acknowledgement'])),
-                block['page'], block.get('y_pos', 0) / 1000,
-            ]
-            features.append(feature_row)
-        return np.array(features)
+        # Training and prediction run on the same blocks, build the matrix once
+        if text_blocks is self._feature_blocks:
+            return self._features
+        
+        features = np.zeros((len(text_blocks), FEATURE_COUNT), dtype=FEATURE_DTYPE)
+        texts = [text.strip() for text in text_blocks.text]
+        lowered = [text.lower() for text in texts]
+        
+        features[:, 0] = [len(text) for text in texts]
+        features[:, 1] = text_blocks.size
+        features[:, 2] = text_blocks.bold
+        features[:, 3] = [len(text.split()) for text in texts]
+        features[:, 4] = [text.isupper() for text in texts]
+        features[:, 5] = [text.istitle() for text in texts]
+        features[:, 6] = [NUMBERED_PATTERN.match(text) is not None for text in texts]
+        features[:, 7] = [SUBNUMBERED_PATTERN.match(text) is not None for text in texts]
+        features[:, 8] = [text.count('.') for text in texts]
+        features[:, 9] = [text.count(' ') for text in texts]
+        features[:, 17] = text_blocks.page
+        features[:, 18] = text_blocks.y_pos / 1000
+        
+        rows, columns = [], []
+        for row, text in enumerate(lowered):
+            for match in KEYWORD_PATTERN.finditer(text):
+                rows.append(row)
+                columns.append(KEYWORD_COLUMNS[match.group(1)])
+        features[rows, columns] = 1
+        
+        self._feature_blocks, self._features = text_blocks, features
+        return features
+    
+    def _clear_features(self):
+        # The detector outlives documents, don't keep the last one's blocks alive
+        self._feature_blocks = self._features = None
     
     def _make_labels(self, text_blocks):
         return np.array([int(self._basic_check(block)) for block in text_blocks])
     
     def _basic_check(self, block):
-        text = block['text'].strip()
+        text = block.text.strip()
         
         if not (5 <= len(text) <= 120):
             return False
         
-        skip_patterns = [
-            r'copyright', r'version \d+', r'page \d+', r'^\d+$',
-            r'may \d+, \d+', r'^\d+ [A-Z]{3,4} \d+$',
-            r'www\.', r'@', r'\.com', r'^\w+$'
-        ]
-        
-        if any(re.search(pattern, text.lower()) for pattern in skip_patterns):
+        if rules.BASIC_SKIP.search(text.lower()):
             return False
         
-        if re.match(r'^\d+\.\s+[A-Z]', text) or re.match(r'^\d+\.\d+\s+[A-Z]', text):
+        if rules.NUMBERED_HEADING.match(text):
             return True
         
-        section_names = [
-            'table of contents', 'revision history', 'acknowledgements',
-            'introduction to the foundation level extensions',
-            'business outcomes', 'content', 'references', 'trademarks',
-            'learning objectives', 'entry requirements'
-        ]
-        
         text_lower = text.lower().strip()
-        if any(section in text_lower and len(text) <= 100 for section in section_names):
+        if len(text) <= 100 and rules.SECTION_NAMES.search(text_lower):
             return True
         
-        if block.get('bold', False) and 10 <= len(text) <= 80:
+        if block.bold and 10 <= len(text) <= 80:
             return True
         
-        if block['size'] > 13 and 10 <= len(text) <= 70:
+        if block.size > 13 and 10 <= len(text) <= 70:
             return True
         
         return False
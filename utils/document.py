@@ -0,0 +1,195 @@
+import hashlib
+import io
+import mmap
+import re
+from .budget import NO_BUDGET
+from .metrics import NULL_METRICS
+
+
+# Object references differ between files holding the same page
+OBJECT_REFERENCE = re.compile(r'(\d+) \d+ R')
+
+# In-memory PDF sources, opened without a copy or a temp file
+BUFFER_TYPES = (bytes, bytearray, memoryview, mmap.mmap)
+
+
+def is_buffer(source):
+    return isinstance(source, BUFFER_TYPES)
+
+
+class BufferReader(io.RawIOBase):
+    """Seekable read-only file over a memoryview, for pdfplumber. Reads copy
+    only the bytes asked for, never the whole buffer."""
+    
+    def __init__(self, buffer):
+        self._buffer = buffer
+        self._position = 0
+    
+    def readable(self):
+        return True
+    
+    def seekable(self):
+        return True
+    
+    def tell(self):
+        return self._position
+    
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._buffer)
+        if offset < 0:
+            raise ValueError(f"negative seek position {offset}")
+        self._position = offset
+        return offset
+    
+    def read(self, size=-1):
+        end = len(self._buffer) if size is None or size < 0 else min(self._position + size, len(self._buffer))
+        data = bytes(self._buffer[self._position:end]) if end > self._position else b''
+        self._position = max(self._position, end)
+        return data
+    
+    def readinto(self, target):
+        data = self.read(len(target))
+        target[:len(data)] = data
+        return len(data)
+
+
+class PDFDocument:
+    """Per-document parse context shared by title detection and block extraction.
+    
+    The fitz document is opened once and each page's ``get_text("dict")`` is
+    computed at most once; pdfplumber is only opened if a stage asks for it.
+    The source is a path or an in-memory PDF (bytes, bytearray, memoryview or
+    mmap). pdfplumber reads it through a memoryview; PyMuPDF (1.23 only takes
+    ``bytes`` or ``bytearray`` streams) gets the caller's object when it is
+    one of those and a single ``bytes`` copy otherwise.
+    """
+    
+    def __init__(self, source):
+        # Only path sources can be reopened, e.g. by page range workers
+        self.path = None if is_buffer(source) else source
+        self._buffer = memoryview(source).cast('B') if is_buffer(source) else None
+        self._stream = source if isinstance(source, (bytes, bytearray)) else None
+        self._fitz_doc = None
+        self._plumber_pdf = None
+        self._page_dicts = {}
+        # Digests of fonts and XObjects with everything they reference, by xref
+        self._object_digests = {}
+        # Filled by TextExtractor.get_text_blocks: 'fitz', 'both' or 'plumber'
+        # (fitz could not read the file) per page
+        self.page_strategies = []
+        # Page numbers (0-based) whose blocks came from the page cache
+        self.reused_pages = []
+        # Stage hooks, replaced by DocumentMetrics when metrics are on
+        self.metrics = NULL_METRICS
+        # Replaced by a DocumentBudget when documents have a latency budget
+        self.budget = NO_BUDGET
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    @property
+    def fitz_doc(self):
+        if self._fitz_doc is None:
+            import fitz
+            if self._buffer is not None:
+                if self._stream is None:
+                    self._stream = bytes(self._buffer)
+                self._fitz_doc = fitz.open(stream=self._stream, filetype="pdf")
+            else:
+                self._fitz_doc = fitz.open(self.path)
+        return self._fitz_doc
+    
+    @property
+    def page_count(self):
+        return self.fitz_doc.page_count
+    
+    @property
+    def metadata(self):
+        return self.fitz_doc.metadata
+    
+    def page_dict(self, page_num):
+        """Return the text dict of a page, caching it for later stages"""
+        if page_num not in self._page_dicts:
+            self._page_dicts[page_num] = self.fitz_doc[page_num].get_text("dict")
+        return self._page_dicts[page_num]
+    
+    def read_page_dict(self, page_num):
+        """Return the text dict of a page, reusing a cached one without retaining new ones"""
+        text_dict = self._page_dicts.get(page_num)
+        if text_dict is None:
+            text_dict = self.fitz_doc[page_num].get_text("dict")
+        return text_dict
+    
+    def page_digest(self, page_num):
+        """Hash of what a page draws: its content stream, fonts and XObjects
+        with every object they reference (encodings, descendant fonts, font
+        descriptors and files, ToUnicode maps), independent of where it sits
+        in the file"""
+        doc = self.fitz_doc
+        page = doc[page_num]
+        digest = hashlib.sha256(repr((tuple(page.rect), page.rotation)).encode())
+        digest.update(page.read_contents())
+        
+        for font in page.get_fonts(full=True):
+            xref, name = font[0], font[4]
+            digest.update(name.encode())
+            if xref:
+                digest.update(self._object_digest(xref))
+        
+        for xobject in page.get_xobjects():
+            digest.update(xobject[1].encode())
+            digest.update(self._object_digest(xobject[0]))
+        return digest.hexdigest()
+    
+    def _object_digest(self, xref, visiting=frozenset()):
+        """Digest of an object with its references replaced by the digests of
+        the objects they point to, and its stream if it has one"""
+        if xref in self._object_digests:
+            return self._object_digests[xref]
+        if xref in visiting:
+            # Reference cycle, the object is already being hashed further up
+            return b'R'
+        
+        doc = self.fitz_doc
+        source = doc.xref_object(xref, compressed=True)
+        digest = hashlib.sha256(OBJECT_REFERENCE.sub('R', source).encode())
+        visiting = visiting | {xref}
+        for reference in OBJECT_REFERENCE.findall(source):
+            digest.update(self._object_digest(int(reference), visiting))
+        if doc.xref_is_stream(xref):
+            digest.update(doc.xref_stream(xref) or b'')
+        
+        self._object_digests[xref] = digest.digest()
+        return self._object_digests[xref]
+    
+    def plumber_pages(self):
+        if self._plumber_pdf is None:
+            # pdfplumber (and pdfminer) only load once a page actually needs them
+            import pdfplumber
+            self._plumber_pdf = pdfplumber.open(
+                BufferReader(self._buffer) if self._buffer is not None else self.path)
+        return self._plumber_pdf.pages
+    
+    def close(self):
+        self._page_dicts.clear()
+        self._object_digests.clear()
+        if self._plumber_pdf is not None:
+            self._plumber_pdf.close()
+            self._plumber_pdf = None
+        if self._fitz_doc is not None:
+            self._fitz_doc.close()
+            self._fitz_doc = None
+        if self._buffer is not None:
+            # Let the caller close or resize the object it passed in (e.g. an mmap)
+            try:
+                self._buffer.release()
+            except BufferError:
+                pass
+            self._buffer = None
+        self._stream = None
@@ -1,19 +1,78 @@
-import fitz
-import pdfplumber
+import math
 import statistics
-import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import repeat
+from operator import itemgetter
+import numpy as np
+from . import rules
+from .blocks import TextBlock, TextBlocks
+from .budget import NO_BUDGET
+from .document import PDFDocument
+
+
+# fitz: PyMuPDF only; both: PyMuPDF + pdfplumber on every page;
+# adaptive: pdfplumber only on pages where PyMuPDF output looks unusable
+STRATEGIES = ('fitz', 'both', 'adaptive')
+
+MIN_PAGE_TEXT = 20
+MAX_BROKEN_RATIO = 0.1
+# pdfplumber seconds per byte of page content stream assumed before a page of
+# the document was timed; dense pages of the sample corpus run 1.5-9 us/byte
+PLUMBER_SECONDS_PER_BYTE = 1e-6
 
 
 class TextExtractor:
+
+    def __init__(self, page_workers=1, page_parallel_threshold=200, strategy='both', page_cache=None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown extraction strategy: {strategy}")
+        
+        # Documents with at least `page_parallel_threshold` pages are split into
+        # page ranges extracted by `page_workers` processes
+        self.page_workers = page_workers
+        self.page_parallel_threshold = page_parallel_threshold
+        self.strategy = strategy
+        # utils.cache.PageCache: unchanged pages are not extracted again
+        self.page_cache = page_cache
+    
+    def open(self, source):
+        return PDFDocument(source)
+    
+    @contextmanager
+    def _document(self, source):
+        if isinstance(source, PDFDocument):
+            yield source
+        else:
+            with self.open(source) as document:
+                yield document
+    
+    def check_readable(self, doc):
+        """Raise when the document can't be parsed, instead of letting the
+        stages below quietly return a default title and no outline"""
+        try:
+            doc.page_count
+        except Exception as e:
+            # In-memory PDFs never take the pdfplumber-only path: PyMuPDF
+            # failing on one means it is broken (or was passed as a type this
+            # PyMuPDF doesn't take), and the result would silently differ
+            if doc.path is None:
+                raise ValueError(f"PyMuPDF could not open the in-memory PDF: {e}")
+            if self.strategy == 'fitz':
+                raise ValueError(f"PyMuPDF could not open the PDF: {e}")
+            try:
+                doc.plumber_pages()
+            except Exception as plumber_error:
+                raise ValueError(f"neither PyMuPDF ({e}) nor pdfplumber ({plumber_error}) could open the PDF")
     
-    def get_title(self, pdf_path):
+    def get_title(self, source):
         try:
-            with fitz.open(pdf_path) as doc:
-                if not doc:
+            with self._document(source) as doc:
+                if not doc.page_count:
                     return "Document"
                 
-                page = doc[0]
-                text_dict = page.get_text("dict")
+                text_dict = doc.page_dict(0)
                 max_size = self._find_max_font_size(text_dict)
                 title_parts = self._collect_large_text(text_dict, max_size)
                 
@@ -24,125 +83,361 @@ class TextExtractor:
         except:
             return "Document"
     
-    def get_text_blocks(self, pdf_path):
-        blocks = []
-        blocks.extend(self._fitz_extraction(pdf_path))
-        blocks.extend(self._plumber_extraction(pdf_path))
-        return self._merge_blocks(blocks)
+    def get_text_blocks(self, source):
+        with self._document(source) as doc:
+            page_ranges = self._page_ranges(doc)
+            if page_ranges:
+                with doc.metrics.stage('page_ranges'):
+                    parts = self._parallel_extraction(doc.path, page_ranges, doc.budget)
+            else:
+                parts = [self._extract_range(doc)]
+            
+            blocks = TextBlocks.concat([range_blocks for range_blocks, _, _ in parts])
+            doc.page_strategies = [strategy for _, strategies, _ in parts for strategy in strategies]
+            doc.reused_pages = [page for _, _, reused in parts for page in reused]
+            
+            if doc.metrics.enabled:
+                doc.metrics.count(pages=len(doc.page_strategies),
+                                  plumber_pages=doc.page_strategies.count('both'), blocks=len(blocks),
+                                  block_bytes=blocks.nbytes())
+                if self.page_cache is not None:
+                    doc.metrics.count(pages_reused=len(doc.reused_pages),
+                                      pages_extracted=len(doc.page_strategies) - len(doc.reused_pages))
+        return blocks
     
-    def _fitz_extraction(self, pdf_path):
-        blocks = []
+    def _extract_range(self, doc, start=0, end=None):
+        strategies = []
+        
+        def page_blocks():
+            for _, blocks, strategy in self.iter_page_blocks(doc, start, end):
+                strategies.append(strategy)
+                yield from blocks
+        
+        # Columns are filled page by page, the records of a page are dropped after it
+        reused = len(doc.reused_pages)
+        blocks = TextBlocks.from_blocks(page_blocks())
+        return blocks, strategies, doc.reused_pages[reused:]
+    
+    def iter_page_blocks(self, doc, start=0, end=None):
+        """Yield (page_num, blocks, strategy) one page at a time.
+        
+        Each page is extracted, merged and released before the next one, so
+        memory does not grow with the page count beyond the blocks themselves.
+        """
+        try:
+            end = doc.page_count if end is None else end
+        except:
+            # fitz can't read the file, pdfplumber is the only source left
+            if self.strategy != 'fitz':
+                yield from self._iter_plumber_pages(doc, start, end)
+            return
+        
+        fitz_ok, plumber_ok = True, self.strategy != 'fitz'
+        # Under a budget, the next page's cost is estimated from the slowest
+        # PyMuPDF page so far and pdfplumber's seconds per content byte
+        fitz_estimate, plumber_seconds, plumber_bytes = 0.0, 0.0, 0
+        for page_num in range(start, end):
+            digest = self._page_digest(doc, page_num)
+            cached = self.page_cache.get(digest, page_num) if digest else None
+            if cached is not None:
+                doc.reused_pages.append(page_num)
+                yield page_num, cached[0], cached[1]
+                continue
+            
+            if not doc.budget.allows('pages', fitz_estimate):
+                doc.budget.degrade('pages', f"pages from {page_num + 1} not extracted")
+                return
+            
+            fitz_blocks = []
+            if fitz_ok:
+                try:
+                    fitz_start = time.perf_counter()
+                    with doc.metrics.stage('fitz'):
+                        fitz_blocks = self._fitz_page_blocks(doc.read_page_dict(page_num), page_num)
+                    fitz_estimate = max(fitz_estimate, time.perf_counter() - fitz_start)
+                except:
+                    fitz_ok = False
+            
+            use_plumber = self.strategy == 'both' or (
+                self.strategy == 'adaptive' and self._needs_plumber(fitz_blocks))
+            plumber_blocks = []
+            content_bytes = 0
+            if use_plumber and plumber_ok and doc.budget.enabled:
+                content_bytes = self._content_size(doc, page_num)
+                rate = max(PLUMBER_SECONDS_PER_BYTE, plumber_seconds / plumber_bytes if plumber_bytes else 0.0)
+                if not doc.budget.allows('plumber', content_bytes * rate):
+                    # Out of time: the rest of the document is PyMuPDF only, and
+                    # like after a failure its pages are not cached
+                    doc.budget.degrade('plumber', f"pdfplumber skipped from page {page_num + 1}")
+                    plumber_ok = False
+            if use_plumber and plumber_ok:
+                try:
+                    plumber_start = time.perf_counter()
+                    with doc.metrics.stage('plumber'):
+                        plumber_blocks = self._plumber_page_blocks(doc.plumber_pages()[page_num], page_num)
+                    plumber_seconds += time.perf_counter() - plumber_start
+                    plumber_bytes += content_bytes
+                except:
+                    plumber_ok = False
+            
+            with doc.metrics.stage('merge'):
+                blocks = self._merge_blocks(fitz_blocks + plumber_blocks)
+            if doc.metrics.enabled:
+                doc.metrics.count(fitz_blocks=len(fitz_blocks), plumber_blocks=len(plumber_blocks))
+            
+            strategy = 'both' if use_plumber and plumber_ok else 'fitz'
+            # Pages extracted after an engine failed are incomplete, don't keep them
+            if digest and fitz_ok and (plumber_ok or not use_plumber):
+                self.page_cache.put(digest, blocks, strategy)
+            yield page_num, blocks, strategy
+    
+    def _content_size(self, doc, page_num):
+        try:
+            return len(doc.fitz_doc[page_num].read_contents())
+        except:
+            return 0
+    
+    def _page_digest(self, doc, page_num):
+        if self.page_cache is None:
+            return None
+        try:
+            with doc.metrics.stage('page_digest'):
+                return doc.page_digest(page_num)
+        except:
+            return None
+    
+    def _iter_plumber_pages(self, doc, start=0, end=None):
+        try:
+            pages = doc.plumber_pages()[start:end]
+        except:
+            return
+        
+        # Under a budget, the next page's cost is estimated from the slowest so far
+        plumber_estimate = 0.0
+        for page_num, page in enumerate(pages, start):
+            if not (doc.budget.allows('plumber', plumber_estimate) and doc.budget.allows('pages', plumber_estimate)):
+                # pdfplumber is the only engine here, skipping it leaves the rest out
+                doc.budget.degrade('plumber', f"pdfplumber skipped from page {page_num + 1}")
+                doc.budget.degrade('pages', f"pages from {page_num + 1} not extracted")
+                return
+            try:
+                plumber_start = time.perf_counter()
+                with doc.metrics.stage('plumber'):
+                    plumber_blocks = self._plumber_page_blocks(page, page_num)
+                plumber_estimate = max(plumber_estimate, time.perf_counter() - plumber_start)
+            except:
+                return
+            yield page_num, self._merge_blocks(plumber_blocks), 'plumber'
+    
+    def _needs_plumber(self, page_blocks):
+        text = ''.join(block.text for block in page_blocks)
+        if len(text) < MIN_PAGE_TEXT:
+            return True
+        
+        # Unmapped glyphs come out as U+FFFD or private-use code points
+        broken_chars = sum(1 for c in text if c == '\ufffd' or '\ue000' <= c <= '\uf8ff')
+        if broken_chars / len(text) > MAX_BROKEN_RATIO:
+            return True
+        
+        broken_fonts = sum(1 for block in page_blocks if block.size <= 0 or not block.font)
+        return broken_fonts / len(page_blocks) > MAX_BROKEN_RATIO
+    
+    def _page_ranges(self, doc):
+        # Workers reopen the file themselves, in-memory documents stay in this process
+        if self.page_workers <= 1 or doc.path is None:
+            return None
         try:
-            with fitz.open(pdf_path) as doc:
-                for page_num, page in enumerate(doc):
-                    text_dict = page.get_text("dict")
-                    for block in text_dict.get("blocks", []):
-                        if block.get('type') == 0:
-                            for line in block.get("lines", []):
-                                text, size, font = "", 0, ""
-                                for span in line.get("spans", []):
-                                    text += span.get('text', '')
-                                    if span.get('size', 0) > size:
-                                        size = span.get('size', 0)
-                                        font = span.get('font', '')
-                                
-                                text = text.strip()
-                                if len(text) >= 3:
-                                    blocks.append({
-                                        'text': text,
-                                        'size': size,
-                                        'page': page_num + 1,
-                                        'font': font,
-                                        'bold': 'bold' in font.lower() or 'black' in font.lower(),
-                                        'y_pos': line.get('bbox', [0, 0, 0, 0])[1] if line.get('bbox') else 0,
-                                        'source': 'fitz'
-                                    })
+            page_count = doc.page_count
         except:
-            pass
+            return None
+        if page_count < self.page_parallel_threshold:
+            return None
+        
+        # Several ranges per worker so uneven pages still balance out
+        step = math.ceil(page_count / (self.page_workers * 4))
+        return [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    
+    def _parallel_extraction(self, pdf_path, page_ranges, budget=NO_BUDGET):
+        count = len(page_ranges)
+        starts = [start for start, _ in page_ranges]
+        ends = [end for _, end in page_ranges]
+        with ProcessPoolExecutor(max_workers=self.page_workers) as pool:
+            parts = list(pool.map(_extract_page_range, [pdf_path] * count, starts, ends,
+                                  [self.strategy] * count, [self.page_cache] * count, [budget] * count))
+        # Workers degrade against their copy of the budget, collect what they gave up
+        for _, _, _, degraded in parts:
+            budget.merge(degraded)
+        return [part[:3] for part in parts]
+    
+    def _fitz_page_blocks(self, text_dict, page_num):
+        blocks = []
+        for block in text_dict.get("blocks", []):
+            if block.get('type') == 0:
+                for line in block.get("lines", []):
+                    text, size, font = "", 0, ""
+                    for span in line.get("spans", []):
+                        text += span.get('text', '')
+                        if span.get('size', 0) > size:
+                            size = span.get('size', 0)
+                            font = span.get('font', '')
+                    
+                    text = text.strip()
+                    if len(text) >= 3:
+                        blocks.append(TextBlock(
+                            text, size, page_num + 1, font,
+                            'bold' in font.lower() or 'black' in font.lower(),
+                            line.get('bbox', [0, 0, 0, 0])[1] if line.get('bbox') else 0,
+                            'fitz'
+                        ))
         return blocks
     
-    def _plumber_extraction(self, pdf_path):
+    def _plumber_page_blocks(self, page, page_num):
         blocks = []
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    chars = page.chars
-                    if chars:
-                        lines = self._group_chars(chars)
-                        for line_data in lines:
-                            text = line_data['text'].strip()
-                            if len(text) >= 3:
-                                blocks.append({
-                                    'text': text,
-                                    'size': line_data['avg_size'],
-                                    'page': page_num + 1,
-                                    'font': line_data['font'],
-                                    'bold': line_data['bold'],
-                                    'y_pos': line_data['y_pos'],
-                                    'source': 'plumber'
-                                })
-        except:
-            pass
+            chars = page.chars
+            if chars:
+                lines = self._group_chars(chars)
+                for line_data in lines:
+                    text = line_data['text'].strip()
+                    if len(text) >= 3:
+                        blocks.append(TextBlock(
+                            text, line_data['avg_size'], page_num + 1, line_data['font'],
+                            line_data['bold'], line_data['y_pos'], 'plumber'
+                        ))
+        finally:
+            # Drop the page's parsed layout and char objects
+            page.flush_cache()
         return blocks
     
     def _group_chars(self, chars):
-        sorted_chars = sorted(chars, key=lambda c: (round(c['top'], 1), c['x0']))
-        lines, current_line, current_y = [], [], None
-        
-        for char in sorted_chars:
-            char_y = round(char['top'], 1)
-            if current_y is None or abs(char_y - current_y) > 3:
-                if current_line:
-                    lines.append(self._make_line(current_line))
-                current_line = [char]
-                current_y = char_y
-            else:
-                current_line.append(char)
+        """Group a page's chars into lines, in reading order.
         
-        if current_line:
-            lines.append(self._make_line(current_line))
-        return [line for line in lines if line]
-    
-    def _make_line(self, char_list):
-        if not char_list:
-            return None
+        A line starts at the first char (by rounded top, then x0) and takes
+        every following char whose rounded top is within 3pt of that first
+        char's. Char fields are pulled into arrays once, so the
+        per-line work is a slice join plus a few reductions.
+        """
+        if not chars:
+            return []
+        
+        # map() over the dicts keeps the per-char work in C
+        count = len(chars)
+        tops = np.array(list(map(itemgetter('top'), chars)), dtype=np.float64)
+        x0s = np.array(list(map(itemgetter('x0'), chars)), dtype=np.float64)
+        sizes = np.array(list(map(dict.get, chars, repeat('size', count))), dtype=np.float64)
+        texts = list(map(dict.get, chars, repeat('text', count), repeat('', count)))
+        fonts = list(map(dict.get, chars, repeat('fontname', count)))
+        
+        rounded = self._round_tops(tops)
+        order = np.lexsort((x0s, rounded))
+        rounded = rounded[order]
+        texts = list(map(texts.__getitem__, order.tolist()))
+        # Missing and zero sizes don't count towards the mean
+        sizes = sizes[order]
+        sizes[sizes == 0] = np.nan
+        
+        # Fonts repeat across a page, so check each name for bold only once
+        font_names = list(dict.fromkeys(fonts))
+        font_table = {font: i for i, font in enumerate(font_names)}
+        font_ids = np.array(list(map(font_table.__getitem__, fonts)), dtype=np.int32)[order]
+        bold_fonts = np.array([bool(font) and ('bold' in font.lower() or 'black' in font.lower())
+                               for font in font_names], dtype=bool)
+        named_fonts = np.array([bool(font) for font in font_names], dtype=bool)
+        
+        starts = self._line_starts(rounded)
+        ends = starts[1:] + [len(rounded)]
+        y_pos = np.minimum.reduceat(tops[order], starts).tolist()
+        bold = np.logical_or.reduceat(bold_fonts[font_ids], starts).tolist()
+        size_min = np.fmin.reduceat(sizes, starts).tolist()
+        size_max = np.fmax.reduceat(sizes, starts).tolist()
         
-        text = ''.join(c.get('text', '') for c in char_list)
-        sizes = [c.get('size', 12) for c in char_list if c.get('size')]
-        fonts = [c.get('fontname', '') for c in char_list if c.get('fontname')]
+        # The line's font is its first named one
+        named = np.flatnonzero(named_fonts[font_ids])
+        first_named = [None] * len(starts)
+        if len(named):
+            candidates = named[np.minimum(np.searchsorted(named, starts), len(named) - 1)].tolist()
+            first_named = [i if i < end else None for i, end in zip(candidates, ends)]
         
-        return {
-            'text': text,
-            'avg_size': statistics.mean(sizes) if sizes else 12,
-            'font': fonts[0] if fonts else '',
-            'bold': any('bold' in f.lower() or 'black' in f.lower() for f in fonts if f),
-            'y_pos': min(c['top'] for c in char_list)
-        }
+        lines = []
+        for i, (start, end) in enumerate(zip(starts, ends)):
+            if size_min[i] != size_min[i]:
+                avg_size = 12
+            elif size_min[i] == size_max[i]:
+                avg_size = size_min[i]
+            else:
+                # Mixed sizes keep the exact statistics.mean result
+                avg_size = statistics.mean(size for size in sizes[start:end].tolist() if size == size)
+            lines.append({
+                'text': ''.join(texts[start:end]),
+                'avg_size': avg_size,
+                'font': font_names[font_ids[first_named[i]]] if first_named[i] is not None else '',
+                'bold': bold[i],
+                'y_pos': y_pos[i],
+            })
+        return lines
+    
+    def _round_tops(self, tops):
+        """round(top, 1) for an array, with Python's exact result near ties"""
+        scaled = tops * 10
+        rounded = np.rint(scaled) / 10
+        # Away from .5 the scaled value rounds the same way as the exact decimal
+        near_tie = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+        for i in near_tie.tolist():
+            rounded[i] = round(float(tops[i]), 1)
+        return rounded
     
-    def _merge_blocks(self, blocks):
-        fitz_blocks = [b for b in blocks if b.get('source') == 'fitz']
-        plumber_blocks = [b for b in blocks if b.get('source') == 'plumber']
+    def _line_starts(self, rounded):
+        """Indices where a new line begins in the sorted rounded tops"""
+        ys = rounded.tolist()
+        count = len(ys)
+        starts, start = [], 0
+        while start < count:
+            starts.append(start)
+            anchor = ys[start]
+            end = int(np.searchsorted(rounded, anchor + 3, 'right'))
+            # Settle float edge cases on the original test, `top - anchor > 3`
+            while end < count and not ys[end] - anchor > 3:
+                end += 1
+            while end - 1 > start and ys[end - 1] - anchor > 3:
+                end -= 1
+            start = max(end, start + 1)
+        return starts
+    
+    def _merge_blocks(self, blocks, threshold=0.85):
+        fitz_blocks = [b for b in blocks if b.source == 'fitz']
+        plumber_blocks = [b for b in blocks if b.source == 'plumber']
+        
+        # A plumber block can only duplicate a fitz block on the same page that
+        # shares at least one word, so index fitz words per page
+        index, fitz_sizes = {}, []
+        for i, fitz_block in enumerate(fitz_blocks):
+            words = self._word_set(fitz_block.text)
+            fitz_sizes.append(len(words))
+            for word in words:
+                index.setdefault((fitz_block.page, word), []).append(i)
         
         unique_blocks = fitz_blocks[:]
         for plumber_block in plumber_blocks:
-            is_duplicate = any(
-                self._similar_text(plumber_block['text'], fitz_block['text']) and
-                plumber_block['page'] == fitz_block['page']
-                for fitz_block in fitz_blocks
-            )
-            if not is_duplicate:
+            if not self._has_similar(plumber_block, index, fitz_sizes, threshold):
                 unique_blocks.append(plumber_block)
         
-        unique_blocks.sort(key=lambda x: (x['page'], x['y_pos']))
+        unique_blocks.sort(key=lambda x: (x.page, x.y_pos))
         return unique_blocks
     
-    def _similar_text(self, text1, text2, threshold=0.85):
-        words1, words2 = set(text1.lower().split()), set(text2.lower().split())
-        if not words1 or not words2:
-            return False
-        intersection = words1.intersection(words2)
-        union = words1.union(words2)
-        return len(intersection) / len(union) > threshold
+    def _has_similar(self, block, index, fitz_sizes, threshold):
+        words = self._word_set(block.text)
+        overlaps = {}
+        for word in words:
+            for i in index.get((block.page, word), ()):
+                overlaps[i] = overlaps.get(i, 0) + 1
+        
+        # Jaccard ratio of the word sets, same as comparing the sets directly
+        size = len(words)
+        return any(overlap / (size + fitz_sizes[i] - overlap) > threshold
+                   for i, overlap in overlaps.items())
+    
+    def _word_set(self, text):
+        return set(text.lower().split())
     
     def _find_max_font_size(self, text_dict):
         max_size = 0
@@ -169,7 +464,7 @@ class TextExtractor:
                     
                     text = text.strip()
                     if (len(text) > 3 and line_max_size >= max_size - 1 and 
-                        not re.search(r'copyright|version|page|\d{4}|international software testing qualifications board', text.lower())):
+                        not rules.TITLE_SKIP.search(text.lower())):
                         title_parts.append(text)
         return title_parts
     
@@ -191,3 +486,10 @@ class TextExtractor:
             if len(title) > 3 and 'untitled' not in title.lower() and len(title) < 150:
                 return title
         return "Document"
+
+
+def _extract_page_range(pdf_path, start, end, strategy, page_cache=None, budget=NO_BUDGET):
+    extractor = TextExtractor(strategy=strategy, page_cache=page_cache)
+    with extractor.open(pdf_path) as doc:
+        doc.budget = budget
+        return extractor._extract_range(doc, start, end) + (budget.degraded,)
@@ -1,160 +1,122 @@
-import re
 from difflib import SequenceMatcher
+from . import rules
+from .budget import NO_BUDGET
+from .metrics import NULL_METRICS
 
 
 class OutlineFormatter:
     
-    def format(self, headings):
+    def format(self, headings, metrics=NULL_METRICS, budget=NO_BUDGET):
         if not headings:
             return []
         
-        filtered = [h for h in headings if not self._should_skip(h['text'])]
+        filtered = [h for h in headings if not self._should_skip(h.text)]
         with_levels = [self._assign_level(h) for h in filtered]
-        return self._remove_duplicates_enhanced(with_levels)
+        with metrics.stage('dedup'):
+            if not budget.allows('dedup'):
+                budget.degrade('dedup', "exact-match deduplication")
+                return self._remove_exact_duplicates(with_levels)
+            return self._remove_duplicates_enhanced(with_levels)
     
     def _should_skip(self, text):
         text_lower = text.lower().strip()
         
-        # ENHANCED: More comprehensive bullet point detection
-        bullet_patterns = [
-            r'^\s*[•·▪▫▬→‣⁃]\s+',     # Unicode bullets
-            r'^\s*[-*+]\s+',           # ASCII bullets
-            r'^\s*[a-z]\)\s+',         # a) b) c) style
-            r'^\s*[a-z]\.\s+[a-z]',    # a. something (lowercase after dot)
-            r'^\s*[ivxlc]+\)\s+',      # i) ii) iii) style
-            r'^\s*[ivxlc]+\.\s+[a-z]', # i. something (lowercase after dot)
-            r'^\s*\([a-z]\)\s+',       # (a) (b) (c) style
-            r'^\s*\d+\)\s+',           # 1) 2) 3) style
-            r'^\s*\(\d+\)\s+',         # (1) (2) (3) style
-        ]
-        
-        # Check for bullet patterns
-        if any(re.search(pattern, text, re.IGNORECASE) for pattern in bullet_patterns):
+        # Bullet points
+        if rules.BULLET.search(text):
             return True
         
-        # Original skip patterns
-        skip_patterns = [
-            r'^\d+\s+[A-Z]{3,4}\s+\d+$', r'^may \d+, \d+$',
-            r'^version \d+', r'^copyright', r'^\d+$',
-            r'^[\d\s\-/.,;:()\[\]]+$'
-        ]
-        
-        if any(re.match(pattern, text) or re.match(pattern, text_lower) for pattern in skip_patterns):
+        # Dates, version lines, bare numbers
+        if rules.SKIP_LINE.match(text) or rules.SKIP_LINE.match(text_lower):
             return True
         
         # Skip common bullet content words when they appear alone
-        bullet_content_words = [
-            'overview', 'international', 'software', 'testing', 'qualifications', 
-            'board', 'foundation', 'level', 'extension', 'agile', 'tester', 'syllabus',
-            'example', 'note', 'important', 'warning', 'tip', 'remember'
-        ]
-        
-        if text_lower in bullet_content_words:
+        if text_lower in rules.BULLET_CONTENT_WORDS:
             return True
         
         # Skip if too short or too long
         if not (5 <= len(text) <= 120):
             return True
         
-        # ADDITIONAL: Skip common bullet point content patterns
-        bullet_content_patterns = [
-            r'the following',
-            r'as follows',
-            r'for example',
-            r'such as',
-            r'including',
-            r'please note',
-            r'^note:',
-            r'^tip:',
-            r'^warning:',
-            r'^important:'
-        ]
-        
-        if any(re.search(pattern, text_lower) for pattern in bullet_content_patterns):
+        # Skip common bullet point content patterns
+        if rules.BULLET_CONTENT.search(text_lower):
             return True
         
         return False
     
     def _assign_level(self, heading):
-        text = heading['text']
+        text = heading.text
         
         # FIRST: Double-check for bullets that might have slipped through
-        bullet_patterns = [
-            r'^\s*[•·▪▫▬→‣⁃]\s+',
-            r'^\s*[-*+]\s+',
-            r'^\s*[a-z]\)\s+',
-            r'^\s*[ivxlc]+\)\s+',
-            r'^\s*\d+\)\s+'
-        ]
-        
-        if any(re.search(pattern, text, re.IGNORECASE) for pattern in bullet_patterns):
+        if rules.LEVEL_BULLET.search(text):
             # This shouldn't be here, but if it is, mark it as H3 to minimize impact
-            return {"level": "H3", "text": text, "page": heading['page']}
+            return {"level": "H3", "text": text, "page": heading.page}
         
         # Regular level assignment
-        if re.match(r'^\d+\.\s+[A-Z]', text):
+        if rules.H1_NUMBERED.match(text):
             level = "H1"
-        elif re.match(r'^\d+\.\d+\s+[A-Z]', text):
+        elif rules.H2_NUMBERED.match(text):
             level = "H2"
-        elif re.match(r'^\d+\.\d+\.\d+\s+', text):
+        elif rules.H3_NUMBERED.match(text):
             level = "H3"
         
         # Section-based assignment
-        elif any(section in text.lower() for section in ['table of contents', 'revision history', 'references']):
+        elif rules.H1_SECTIONS.search(text.lower()):
             level = "H1"
-        elif any(section in text.lower() for section in ['business outcomes', 'content', 'learning objectives']):
+        elif rules.H2_SECTIONS.search(text.lower()):
             level = "H2"
         
         # Default assignment with bullet check
         else:
             # If it looks like bullet content, make it H3
-            if (text[0].islower() or 
-                any(word in text.lower() for word in ['the following', 'as follows', 'including', 'such as'])):
+            if text[0].islower() or rules.BULLET_PHRASES.search(text.lower()):
                 level = "H3"
             else:
                 level = "H1"
         
-        return {"level": level, "text": text, "page": heading['page']}
+        return {"level": level, "text": text, "page": heading.page}
     
     def _normalize_text(self, text):
         """Normalize text for better comparison"""
         # Remove extra whitespace and convert to lowercase
-        normalized = re.sub(r'\s+', ' ', text.lower().strip())
+        normalized = rules.WHITESPACE.sub(' ', text.lower().strip())
         
         # Remove common prefixes that might vary
-        normalized = re.sub(r'^\d+[\.\s]*', '', normalized)  # Remove numbering
-        normalized = re.sub(r'^[ivxlc]+[\.\s]*', '', normalized, flags=re.IGNORECASE)  # Remove roman numerals
+        normalized = rules.LEADING_NUMBER.sub('', normalized)  # Remove numbering
+        normalized = rules.LEADING_ROMAN.sub('', normalized)  # Remove roman numerals
         
         # Remove punctuation at the end
-        normalized = re.sub(r'[.,:;!?]*$', '', normalized)
+        normalized = rules.TRAILING_PUNCTUATION.sub('', normalized)
         
         return normalized
     
     def _are_similar_headings(self, text1, text2, page1, page2):
         """Check if two headings are similar enough to be considered duplicates"""
-        
-        # Normalize texts for comparison
-        norm1 = self._normalize_text(text1)
-        norm2 = self._normalize_text(text2)
+        return self._similar_normalized(
+            self._normalize_text(text1), self._normalize_text(text2), page1, page2
+        )
+    
+    def _similar_normalized(self, norm1, norm2, page1, page2):
+        """Duplicate check on already normalized texts"""
         
         # If normalized texts are identical
         if norm1 == norm2:
             return True
         
-        # Check fuzzy similarity
-        similarity = SequenceMatcher(None, norm1, norm2).ratio()
+        distance = abs(page1 - page2)
+        if distance > 2:
+            return False
         
-        # High similarity on same page
-        if similarity > 0.9 and page1 == page2:
-            return True
-        
-        # Very high similarity within nearby pages
-        if similarity > 0.95 and abs(page1 - page2) <= 2:
+        # High similarity on same page, very high similarity within nearby pages.
+        # The quick ratios are upper bounds of ratio(), so they can only rule pairs out
+        threshold = 0.9 if distance == 0 else 0.95
+        matcher = SequenceMatcher(None, norm1, norm2)
+        if (matcher.real_quick_ratio() > threshold and matcher.quick_ratio() > threshold
+                and matcher.ratio() > threshold):
             return True
         
         # Check for common patterns that indicate same heading
         # Example: "1. Introduction" vs "Introduction" 
-        if (norm1 in norm2 or norm2 in norm1) and abs(page1 - page2) <= 1:
+        if (norm1 in norm2 or norm2 in norm1) and distance <= 1:
             shorter = norm1 if len(norm1) < len(norm2) else norm2
             longer = norm2 if len(norm1) < len(norm2) else norm1
             
@@ -164,47 +126,67 @@ class OutlineFormatter:
         
         return False
     
+    def _remove_exact_duplicates(self, outline):
+        """Cheap deduplication: first heading of each normalized text only"""
+        seen = set()
+        result = []
+        for item in outline:
+            item_norm = self._normalize_text(item['text'])
+            if item_norm not in seen:
+                seen.add(item_norm)
+                result.append(item)
+        return result
+    
     def _remove_duplicates_enhanced(self, outline):
         """Enhanced deduplication with fuzzy matching and better logic"""
         if not outline:
             return []
         
-        result = []
+        # Apart from exact normalized matches, duplicates are at most two pages
+        # apart, so only kept headings from those pages are compared
+        result, result_norms = [], []
+        by_page, by_norm = {}, {}
         
         for item in outline:
-            is_duplicate = False
+            item_norm = self._normalize_text(item['text'])
+            page = item['page']
             
-            for existing in result:
-                if self._are_similar_headings(
-                    item['text'], existing['text'], 
-                    item['page'], existing['page']
-                ):
+            candidates = set(by_norm.get(item_norm, ()))
+            for nearby in range(page - 2, page + 3):
+                candidates.update(by_page.get(nearby, ()))
+            
+            is_duplicate = False
+            for i in sorted(candidates):
+                existing = result[i]
+                if self._similar_normalized(item_norm, result_norms[i], page, existing['page']):
                     is_duplicate = True
                     
                     # Keep the better version (longer text, or first occurrence)
                     if len(item['text']) > len(existing['text']):
                         # Replace existing with current item
-                        result[result.index(existing)] = item
+                        by_page[existing['page']].discard(i)
+                        by_norm[result_norms[i]].discard(i)
+                        by_page.setdefault(page, set()).add(i)
+                        by_norm.setdefault(item_norm, set()).add(i)
+                        result[i], result_norms[i] = item, item_norm
                     
                     break
             
             if not is_duplicate:
+                by_page.setdefault(page, set()).add(len(result))
+                by_norm.setdefault(item_norm, set()).add(len(result))
                 result.append(item)
+                result_norms.append(item_norm)
         
         # Final cleanup: remove items that are substrings of others on same page
         final_result = []
-        for item in result:
-            is_substring = False
-            
-            for other in result:
-                if (item != other and 
-                    item['page'] == other['page'] and
-                    len(item['text']) < len(other['text']) and
-                    self._normalize_text(item['text']) in self._normalize_text(other['text'])):
-                    is_substring = True
-                    break
+        for i, item in enumerate(result):
+            is_substring = any(
+                len(item['text']) < len(result[j]['text']) and result_norms[i] in result_norms[j]
+                for j in by_page[item['page']]
+            )
             
             if not is_substring:
                 final_result.append(item)
         
-        return final_result
\ No newline at end of file
+        return final_result
@@ -0,0 +1,112 @@
+import json
+import math
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from pathlib import Path
+
+
+class DocumentMetrics:
+    """Durations and counts recorded around the pipeline stages of one document"""
+    
+    enabled = True
+    
+    def __init__(self, document):
+        self.document = str(document)
+        self.stages = {}
+        self.counts = {}
+        self.start = time.perf_counter()
+    
+    def stage(self, name):
+        return _Stage(self, name)
+    
+    def count(self, **counts):
+        for name, value in counts.items():
+            self.counts[name] = self.counts.get(name, 0) + value
+    
+    def to_dict(self):
+        return {
+            "document": self.document,
+            "seconds": round(time.perf_counter() - self.start, 6),
+            "stages": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+            "counts": dict(self.counts),
+        }
+
+
+class _Stage:
+
+    __slots__ = ('metrics', 'name', 'start')
+    
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        stages = self.metrics.stages
+        stages[self.name] = stages.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class NullMetrics:
+    """Stand-in used when metrics are off: every hook is a no-op"""
+    
+    enabled = False
+    
+    _stage = nullcontext()
+    
+    def stage(self, name):
+        return self._stage
+    
+    def count(self, **counts):
+        pass
+    
+    def to_dict(self):
+        return None
+
+
+NULL_METRICS = NullMetrics()
+
+
+class MetricsWriter:
+    """Appends one JSON object per document to a JSON-lines file"""
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+    
+    def write(self, record):
+        if record is not None:
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._file.flush()
+    
+    def close(self):
+        self._file.close()
+
+
+class LatencyStats:
+    """Rolling window of request latencies, summarised as percentiles"""
+    
+    def __init__(self, window=1000):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+    
+    def record(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+            self.count += 1
+    
+    def percentiles(self, points=(50, 90, 99)):
+        """Latency in ms at each percentile (nearest rank) over the window"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return {f"p{point}": None for point in points}
+        return {f"p{point}": round(1000 * latencies[max(0, math.ceil(len(latencies) * point / 100) - 1)], 2)
+                for point in points}
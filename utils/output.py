@@ -0,0 +1,38 @@
+import json
+from pathlib import Path
+
+
+DEFAULT_FLUSH_EVERY = 100
+
+
+class JsonLinesSink:
+    """Appends one compact JSON result per document to a single JSON-lines file.
+    
+    Lines are buffered and written together every `flush_every` documents (and
+    on close), instead of one small file write per PDF.
+    """
+    
+    def __init__(self, path, flush_every=DEFAULT_FLUSH_EVERY):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_every = max(1, flush_every)
+        self.written = 0
+        self._lines = []
+        self._file = open(self.path, 'a', encoding='utf-8')
+    
+    def write(self, name, result):
+        record = {"file": name, **result}
+        self._lines.append(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        if len(self._lines) >= self.flush_every:
+            self.flush()
+    
+    def flush(self):
+        if self._lines:
+            self._file.write(''.join(self._lines))
+            self._file.flush()
+            self.written += len(self._lines)
+            self._lines = []
+    
+    def close(self):
+        self.flush()
+        self._file.close()
@@ -0,0 +1,105 @@
+"""Heading rules shared by HeadingDetector and OutlineFormatter.
+
+Each rule group is compiled once at import time into a single alternation,
+word lists that are compared whole become sets.
+"""
+import re
+
+
+def _any_of(patterns, flags=0):
+    return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns), flags)
+
+
+def _any_phrase(phrases):
+    return re.compile('|'.join(re.escape(phrase) for phrase in phrases))
+
+
+# HeadingDetector._basic_check
+
+BASIC_SKIP = _any_of([
+    r'copyright', r'version \d+', r'page \d+', r'^\d+$',
+    r'may \d+, \d+', r'^\d+ [A-Z]{3,4} \d+$',
+    r'www\.', r'@', r'\.com', r'^\w+$'
+])
+
+NUMBERED_HEADING = _any_of([r'^\d+\.\s+[A-Z]', r'^\d+\.\d+\s+[A-Z]'])
+
+SECTION_NAMES = _any_phrase([
+    'table of contents', 'revision history', 'acknowledgements',
+    'introduction to the foundation level extensions',
+    'business outcomes', 'content', 'references', 'trademarks',
+    'learning objectives', 'entry requirements'
+])
+
+
+# OutlineFormatter._should_skip
+
+BULLET = _any_of([
+    r'^\s*[•·▪▫▬→‣⁃]\s+',     # Unicode bullets
+    r'^\s*[-*+]\s+',           # ASCII bullets
+    r'^\s*[a-z]\)\s+',         # a) b) c) style
+    r'^\s*[a-z]\.\s+[a-z]',    # a. something (lowercase after dot)
+    r'^\s*[ivxlc]+\)\s+',      # i) ii) iii) style
+    r'^\s*[ivxlc]+\.\s+[a-z]', # i. something (lowercase after dot)
+    r'^\s*\([a-z]\)\s+',       # (a) (b) (c) style
+    r'^\s*\d+\)\s+',           # 1) 2) 3) style
+    r'^\s*\(\d+\)\s+',         # (1) (2) (3) style
+], re.IGNORECASE)
+
+SKIP_LINE = _any_of([
+    r'^\d+\s+[A-Z]{3,4}\s+\d+$', r'^may \d+, \d+$',
+    r'^version \d+', r'^copyright', r'^\d+$',
+    r'^[\d\s\-/.,;:()\[\]]+$'
+])
+
+# Common bullet content words when they appear alone
+BULLET_CONTENT_WORDS = frozenset([
+    'overview', 'international', 'software', 'testing', 'qualifications',
+    'board', 'foundation', 'level', 'extension', 'agile', 'tester', 'syllabus',
+    'example', 'note', 'important', 'warning', 'tip', 'remember'
+])
+
+BULLET_CONTENT = _any_of([
+    r'the following', r'as follows', r'for example', r'such as',
+    r'including', r'please note', r'^note:', r'^tip:', r'^warning:', r'^important:'
+])
+
+
+# OutlineFormatter._assign_level
+
+LEVEL_BULLET = _any_of([
+    r'^\s*[•·▪▫▬→‣⁃]\s+',
+    r'^\s*[-*+]\s+',
+    r'^\s*[a-z]\)\s+',
+    r'^\s*[ivxlc]+\)\s+',
+    r'^\s*\d+\)\s+'
+], re.IGNORECASE)
+
+H1_NUMBERED = re.compile(r'^\d+\.\s+[A-Z]')
+H2_NUMBERED = re.compile(r'^\d+\.\d+\s+[A-Z]')
+H3_NUMBERED = re.compile(r'^\d+\.\d+\.\d+\s+')
+
+H1_SECTIONS = _any_phrase(['table of contents', 'revision history', 'references'])
+H2_SECTIONS = _any_phrase(['business outcomes', 'content', 'learning objectives'])
+
+BULLET_PHRASES = _any_phrase(['the following', 'as follows', 'including', 'such as'])
+
+
+# OutlineFormatter._normalize_text
+
+WHITESPACE = re.compile(r'\s+')
+LEADING_NUMBER = re.compile(r'^\d+[\.\s]*')
+LEADING_ROMAN = re.compile(r'^[ivxlc]+[\.\s]*', re.IGNORECASE)
+TRAILING_PUNCTUATION = re.compile(r'[.,:;!?]*$')
+
+
+# TextExtractor._collect_large_text
+
+TITLE_SKIP = re.compile(r'copyright|version|page|\d{4}|international software testing qualifications board')
+
+
+# BookmarkReader._check: bookmark titles that name a file or hold no words
+BOOKMARK_JUNK = _any_of([
+    r'\.(?:tiff?|jpe?g|png|gif|bmp|pdf|docx?)$',
+    r'^\W*$'
+], re.IGNORECASE)